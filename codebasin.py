@@ -18,6 +18,11 @@ optional arguments:
                         desired output reports (default: all)
   -d DUMPFILE, --dump DUMPFILE
                         dump annotated parse tree to DUMPFILE
+
+With --serve, the analysis is kept resident and JSON-RPC 2.0 requests are
+answered one per line on stdin/stdout (or on a Unix domain socket given by
+--socket). Supported methods are "platforms" (params: file, and optionally
+start_line and end_line), "summary", "refresh" and "shutdown".
 """
 
 import argparse
@@ -25,7 +30,7 @@ import os
 import sys
 import logging
 
-from codebasin import config, finder, report, util
+from codebasin import cache, config, finder, incremental, report, util
 from codebasin.walkers.platform_mapper import PlatformMapper
 
 version = "1.1.0-rc0"
@@ -77,12 +82,49 @@ if __name__ == '__main__':
                         help='desired output reports (default: all)')
     parser.add_argument('-d', '--dump', dest='dump', metavar='<file.json>',
                         action='store',
-                        help='dump out annotated platform/parsing tree to <file.json>')
+                        help='dump out annotated platform/parsing tree to <file.json>, ' +
+                        'to <file.jsonl> with one line per file, ' +
+                        'or to <file.npz> in a compact binary format')
     parser.add_argument('--batchmode', dest='batchmode', action='store_true', default=False,
                         help="Set batch mode (additional output for bulk operation.)")
+    parser.add_argument('-j', '--jobs', dest='jobs', metavar='N', type=int, default=1,
+                        help="number of worker processes to use for parsing (default: 1)")
+    parser.add_argument('--cache-dir', dest='cache_dir', metavar='DIR', action='store',
+                        help="cache parsed source files in DIR, and reuse them when unchanged")
+    parser.add_argument('--incremental', dest='incremental', action='store_true', default=False,
+                        help="only re-analyze compilation commands affected by changes since "
+                        "the previous run (requires --cache-dir)")
+    parser.add_argument('--stream', dest='stream', action='store_true', default=False,
+                        help="process one compilation command at a time, releasing each "
+                        "source file once it is no longer needed, to reduce memory use")
+    parser.add_argument('--serve', dest='serve', action='store_true', default=False,
+                        help="keep the analysis resident and answer JSON-RPC queries, one per "
+                        "line, on stdin/stdout (or on --socket)")
+    parser.add_argument('--socket', dest='socket', metavar='PATH', action='store',
+                        help="answer queries on a Unix domain socket at PATH (requires --serve)")
+    parser.add_argument('--poll-interval', dest='poll_interval', metavar='SECONDS', type=float,
+                        default=1.0,
+                        help="how often --serve checks for changed files (default: 1.0)")
     args = parser.parse_args()
-
-    stdout_log = logging.StreamHandler(sys.stdout)
+    if args.incremental and not args.cache_dir:
+        parser.error("--incremental requires --cache-dir")
+    if args.incremental and args.jobs > 1:
+        parser.error("--incremental cannot be combined with --jobs")
+    if args.stream:
+        for (option, value) in [("--dump", args.dump), ("--incremental", args.incremental),
+                                ("--jobs", args.jobs > 1)]:
+            if value:
+                parser.error(f"--stream cannot be combined with {option}")
+    if args.socket and not args.serve:
+        parser.error("--socket requires --serve")
+    if args.serve:
+        for (option, value) in [("--dump", args.dump), ("--incremental", args.incremental),
+                                ("--stream", args.stream), ("--jobs", args.jobs > 1)]:
+            if value:
+                parser.error(f"--serve cannot be combined with {option}")
+
+    # When serving on stdin/stdout, stdout is reserved for responses
+    stdout_log = logging.StreamHandler(sys.stderr if args.serve else sys.stdout)
     stdout_log.setFormatter(logging.Formatter('[%(levelname)-8s] %(message)s'))
     logging.getLogger("codebasin").addHandler(stdout_log)
     logging.getLogger("codebasin").setLevel(
@@ -98,22 +140,55 @@ if __name__ == '__main__':
         logging.getLogger("codebasin").error(
             "Configuration file does not have YAML file extension.")
         sys.exit(1)
+
+    parse_cache = None
+    if args.cache_dir:
+        parse_cache = cache.ParseCache(args.cache_dir)
+
+    if args.serve:
+        from codebasin import server
+
+        analysis_server = server.AnalysisServer(config_file, rootdir, parse_cache=parse_cache,
+                                                interval=args.poll_interval)
+        if args.socket:
+            server.serve_socket(analysis_server, args.socket)
+        else:
+            server.serve_stream(analysis_server, sys.stdin, sys.stdout)
+        sys.exit(0)
+
     codebase, configuration = config.load(config_file, rootdir)
 
     # Parse the source tree, and determine source line associations.
     # The trees and associations are housed in state.
-    state = finder.find(rootdir, codebase, configuration)
+    history = None
+    if args.incremental:
+        history = incremental.AnalysisHistory(incremental.AnalysisHistory.default_path(
+            args.cache_dir, config_file, rootdir))
+
+    if args.stream:
+        # Count lines for platforms as each file is released
+        setmap = finder.stream(rootdir, codebase, configuration, cache=parse_cache)
+    else:
+        state = finder.find(rootdir, codebase, configuration, jobs=args.jobs, cache=parse_cache,
+                            history=history)
+        if history is not None:
+            history.save()
+            logging.getLogger("codebasin").info(
+                "Replayed %d compilation commands; re-analyzed %d", history.hits, history.misses)
 
-    # Count lines for platforms
-    platform_mapper = PlatformMapper(codebase)
-    setmap = platform_mapper.walk(state)
+        # Count lines for platforms
+        platform_mapper = PlatformMapper(codebase)
+        setmap = platform_mapper.walk(state)
 
     if args.dump:
-        if util.ensure_json(args.dump):
+        if util.ensure_json(args.dump) or util.ensure_jsonl(args.dump):
             report.annotated_dump(args.dump, state)
+        elif util.ensure_npz(args.dump):
+            report.binary_dump(args.dump, state, codebase)
         else:
             logging.getLogger("codebasin").warning(
-                f"Output path for annotation dump must end with .json (got {args.dump}); skipping dump.")
+                "Output path for annotation dump must end with .json, .jsonl or .npz " +
+                f"(got {args.dump}); skipping dump.")
 
     if args.batchmode and (report_enabled("summary") or report_enabled("clustering")):
         print(f"Config file: {config_file}")
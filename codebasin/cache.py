@@ -0,0 +1,196 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Contains classes and functions for caching the results of parsing
+source files on disk, so that unchanged files need not be re-parsed.
+"""
+
+import logging
+import os
+import pickle
+import tempfile
+
+from . import util
+from .language import FileLanguage
+
+log = logging.getLogger("codebasin")
+
+# The version of the trees stored in the cache.
+# This must be incremented whenever a change to the parser or to the
+# node/token classes would change (or break) the trees that it stores.
+version = 5
+
+
+class ParseCache():
+    """
+    A persistent cache of SourceTree objects, keyed by the content hash
+    of each source file, the language it was parsed as, and the version
+    of the parser.
+
+    Trees are stored using pickle, so a cache directory should only be
+    shared between trusted users.
+    """
+
+    def __init__(self, directory):
+        self.directory = os.path.realpath(directory)
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+
+    def _path(self, fn, summarize_only):
+        """
+        Return the path to the cache entry for the file fn.
+        """
+        digest = util.compute_file_hash(fn)
+        language = FileLanguage(fn).get_language()
+        mode = "summary" if summarize_only else "full"
+        name = f"{digest}-{language}-{mode}-v{version}.pickle"
+        return os.path.join(self.directory, digest[:2], name)
+
+    # pylint: disable=no-self-use,unused-argument
+    def load_resident(self, fn, summarize_only):
+        """
+        Return the SourceTree for the file fn if it can be loaded without
+        reading the file. A ParseCache must hash the file, so return None.
+        """
+        return None
+
+    def load(self, fn, summarize_only):
+        """
+        Return the cached SourceTree for the file fn, or None if there
+        is no valid cache entry for it.
+        """
+        path = self._path(fn, summarize_only)
+        try:
+            with util.safe_open_read_nofollow(path, 'rb') as f:
+                tree = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception:  # pylint: disable=broad-except
+            log.warning("Ignoring invalid parse cache entry %s", path)
+            return None
+
+        # The same contents may have been cached from a different path
+        tree.associate_file(os.path.realpath(fn))
+        return tree
+
+    def store(self, fn, tree, summarize_only):
+        """
+        Store the SourceTree built for the file fn in the cache.
+        """
+        path = self._path(fn, summarize_only)
+        directory = os.path.dirname(path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+
+        # Write to a temporary file and rename it, so that concurrent
+        # readers and writers never see a partial entry.
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                pickle.dump(tree, f, protocol=pickle.DEFAULT_PROTOCOL)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+
+class MemoryParseCache():
+    """
+    An in-memory cache of SourceTree objects, keyed by the path of each
+    source file and validated against its modification time and size.
+    Misses are passed on to another cache (e.g. a ParseCache), if one is
+    provided.
+
+    Trees are shared with whoever loads them, so this cache is only
+    suitable for trees that are not modified after parsing.
+
+    A tree is stored under the fingerprint observed when the cache was
+    last missed for its file, i.e. before the file was read, so that a
+    change made while the file was being parsed is not recorded as seen.
+    """
+
+    def __init__(self, fallback=None):
+        self.fallback = fallback
+        self._trees = {}
+        self._observed = {}
+
+    @staticmethod
+    def _fingerprint(fn):
+        """
+        Return the (modification time, size) of the file fn, or None if
+        it cannot be accessed.
+        """
+        try:
+            st = os.stat(fn)
+        except OSError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def fingerprint(self, fn, summarize_only):
+        """
+        Return the fingerprint of the file fn that the SourceTree held in
+        memory for it corresponds to, or None if there is no such tree.
+        """
+        entry = self._trees.get((fn, summarize_only))
+        if entry is None:
+            return None
+        return entry[0]
+
+    def load_resident(self, fn, summarize_only):
+        """
+        Return the SourceTree held in memory for the file fn, or None if
+        there is no valid entry for it. The fallback is not consulted.
+        """
+        key = (fn, summarize_only)
+        fingerprint = self._fingerprint(fn)
+        entry = self._trees.get(key)
+        if entry is not None and fingerprint is not None and entry[0] == fingerprint:
+            return entry[1]
+
+        # Keep the earliest observation, which precedes any read
+        self._observed.setdefault(key, fingerprint)
+        return None
+
+    def load(self, fn, summarize_only):
+        """
+        Return the cached SourceTree for the file fn, or None if there
+        is no valid cache entry for it.
+        """
+        tree = self.load_resident(fn, summarize_only)
+        if tree is not None:
+            return tree
+
+        if self.fallback is None:
+            return None
+        tree = self.fallback.load(fn, summarize_only)
+        if tree is not None:
+            self._remember(fn, tree, summarize_only)
+        return tree
+
+    def _remember(self, fn, tree, summarize_only):
+        """
+        Hold the SourceTree for the file fn in memory, under the
+        fingerprint observed before it was read.
+        """
+        key = (fn, summarize_only)
+        try:
+            fingerprint = self._observed.pop(key)
+        except KeyError:
+            fingerprint = self._fingerprint(fn)
+        if fingerprint is not None:
+            self._trees[key] = (fingerprint, tree)
+
+    def store(self, fn, tree, summarize_only):
+        """
+        Store the SourceTree built for the file fn in the cache.
+        """
+        self._remember(fn, tree, summarize_only)
+        if self.fallback is not None:
+            self.fallback.store(fn, tree, summarize_only)
+
+    def prune(self, filenames):
+        """
+        Forget the trees of any files not in filenames.
+        """
+        filenames = set(filenames)
+        self._trees = {key: value for (key, value) in self._trees.items()
+                       if key[0] in filenames}
+        self._observed = {}
@@ -0,0 +1,69 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Contains classes for querying the files that make up a code base.
+"""
+
+import bisect
+import os
+
+
+class CodeBaseIndex:
+    """
+    Index of the files in a code base definition, answering membership
+    tests in constant time and listing the files below a directory.
+    """
+
+    def __init__(self, files, exclude_files=()):
+        self.files = frozenset(files)
+        self.exclude_files = frozenset(exclude_files)
+        self._sorted = None
+
+    @classmethod
+    def from_codebase(cls, codebase):
+        """
+        Build an index from a codebase dict, as returned by
+        config.load_codebase.
+        """
+        return cls(codebase["files"], codebase.get("exclude_files", ()))
+
+    def __contains__(self, filename):
+        return filename in self.files
+
+    def __len__(self):
+        return len(self.files)
+
+    def excludes(self, filename):
+        """
+        Return true if filename is not part of the code base, either
+        because it is not listed or because it is explicitly excluded.
+        """
+        return filename not in self.files or filename in self.exclude_files
+
+    def _range(self, directory):
+        """
+        Return the range of sorted filenames below directory.
+        """
+        if self._sorted is None:
+            self._sorted = sorted(self.files)
+        prefix = os.path.join(directory, "")
+        # Every path below directory sorts before this upper bound
+        bound = prefix[:-1] + chr(ord(prefix[-1]) + 1)
+        return (bisect.bisect_left(self._sorted, prefix),
+                bisect.bisect_left(self._sorted, bound))
+
+    def files_in(self, directory):
+        """
+        Return a sorted list of the files in the code base below the
+        specified directory, including its subdirectories.
+        """
+        (first, last) = self._range(directory)
+        return self._sorted[first:last]
+
+    def contains_directory(self, directory):
+        """
+        Return true if any file in the code base is below the specified
+        directory.
+        """
+        (first, last) = self._range(directory)
+        return first < last
@@ -7,15 +7,15 @@ defining a specific code base configuration.
 
 import os
 import collections
+import fnmatch
 import glob
 import itertools as it
 import logging
+import re
 import shlex
 import sys
 
-import yaml
 import json
-import jsonschema
 from . import util
 
 log = logging.getLogger("codebasin")
@@ -209,6 +209,58 @@ def extract_include_files(args):
     return includes
 
 
+# Characters that shlex.split treats differently from str.split
+_shlex_special = re.compile(r"[\"'\\\x0b\x0c\x1c-\x1f]|[^\x00-\x7f]")
+
+
+def split_command(command):
+    """
+    Split a command into arguments in the same way as shlex.split,
+    using str.split when the command contains no quotes or escapes.
+    """
+    if _shlex_special.search(command):
+        return shlex.split(command)
+    return command.split()
+
+
+def extract_flags(args):
+    """
+    Extract definitions, include paths and include files from
+    command-line arguments in a single pass.
+    Return the same lists as extract_defines, extract_include_paths and
+    extract_include_files.
+    """
+    defines = []
+    include_paths = []
+    include_files = []
+    define_prefix = ""
+    path_prefix = ""
+    file_prefix = ""
+    for a in args:
+        if a == "-D":
+            define_prefix = a
+        elif define_prefix:
+            defines.append(a)
+            define_prefix = ""
+        elif a[0:2] == "-D":
+            defines.append(a[2:])
+
+        if a == "-I" or a == "-isystem":
+            path_prefix = a
+        elif path_prefix:
+            include_paths.append(a)
+            path_prefix = ""
+        elif a[0:2] == "-I":
+            include_paths.append(a[2:])
+
+        if a == "-include":
+            file_prefix = a
+        elif file_prefix:
+            include_files.append(a)
+            file_prefix = ""
+    return (defines, include_paths, include_files)
+
+
 def expand_path(pattern):
     """
     Return all valid and existing paths matching a specified pattern.
@@ -224,6 +276,211 @@ def expand_path(pattern):
     return [os.path.realpath(path) for path in filter(util.valid_path, paths)]
 
 
+# Marks a "**" component, which matches any number of directories
+_RECURSIVE = object()
+
+
+def _split_pattern(pattern):
+    """
+    Split a pattern into a base directory without wildcards and a list
+    of compiled components to be matched below it.
+    Return None if the pattern should be expanded by glob instead.
+    """
+    if os.path.altsep:
+        pattern = pattern.replace(os.path.altsep, os.sep)
+    (drive, path) = os.path.splitdrive(pattern)
+    parts = path.split(os.sep)
+    magic = [k for (k, part) in enumerate(parts) if glob.has_magic(part)]
+    if not magic:
+        return None
+
+    # Wildcards followed by relative or empty components (or a trailing
+    # separator) are left to glob.
+    k = magic[0]
+    if any(part in ("", os.curdir, os.pardir) for part in parts[k:]):
+        return None
+
+    if k == 0:
+        base = drive + os.curdir
+    elif parts[:k] == [""]:
+        base = drive + os.sep
+    else:
+        base = drive + os.sep.join(parts[:k])
+    if os.pardir not in parts[:k]:
+        base = os.path.normpath(base)
+
+    flags = re.IGNORECASE if os.path.normcase("A") == "a" else 0
+    components = []
+    for part in parts[k:]:
+        if part == "**":
+            components.append(_RECURSIVE)
+        elif glob.has_magic(part):
+            match = re.compile(fnmatch.translate(part), flags).match
+            components.append((match, part.startswith(".")))
+        else:
+            components.append(os.path.normcase(part))
+    return (base, components)
+
+
+def _closure(states, patterns):
+    """
+    Return states extended to account for "**" components matching
+    zero directories.
+    """
+    closed = set()
+    pending = list(states)
+    while pending:
+        (index, pos) = state = pending.pop()
+        if state in closed:
+            continue
+        closed.add(state)
+        components = patterns[index]
+        if pos < len(components) and components[pos] is _RECURSIVE:
+            pending.append((index, pos + 1))
+    return closed
+
+
+def _walk(directory, real, states, patterns, active):
+    """
+    Yield (index, path) for every path below directory that completes
+    a pattern, given the set of partially matched (index, position)
+    states for the directory itself. real is the real path of the
+    directory, and active holds the (real path, states) of the
+    directories currently being walked.
+    """
+    literal = collections.defaultdict(list)
+    wildcard = []
+    recursive = []
+    for (index, pos) in states:
+        if pos == len(patterns[index]):
+            continue
+        component = patterns[index][pos]
+        if component is _RECURSIVE:
+            recursive.append((index, pos))
+        elif isinstance(component, str):
+            literal[component].append((index, pos + 1))
+        else:
+            (match, hidden) = component
+            wildcard.append((index, pos + 1, match, hidden))
+
+    # Components without wildcards can be checked directly, as glob does
+    if wildcard or recursive:
+        try:
+            with os.scandir(directory) as it_entries:
+                entries = [(entry.name, entry.path, entry.is_dir, entry.is_symlink)
+                           for entry in it_entries]
+        except OSError:
+            return
+    else:
+        entries = []
+        for name in literal:
+            path = os.path.join(directory, name)
+            if os.path.lexists(path):
+                entries.append((name, path, lambda p=path: os.path.isdir(p),
+                                lambda p=path: os.path.islink(p)))
+
+    subdirs = []
+    for (name, path, is_dir, is_symlink) in entries:
+        name = os.path.normcase(name)
+        hidden = name.startswith(".")
+        matched = set(literal.get(name, ()))
+        for (index, pos, match, allows_hidden) in wildcard:
+            if (allows_hidden or not hidden) and match(name):
+                matched.add((index, pos))
+        if not hidden:
+            matched.update(recursive)
+        if not matched:
+            continue
+
+        matched = _closure(matched, patterns)
+        for (index, pos) in matched:
+            if pos == len(patterns[index]):
+                yield (index, path)
+        if any(pos < len(patterns[index]) for (index, pos) in matched):
+            try:
+                if is_dir():
+                    subdirs.append((name, path, matched, is_symlink()))
+            except OSError:
+                pass
+
+    for (name, path, matched, is_symlink) in subdirs:
+        # Links back to a directory that is already being walked with the
+        # same states can only produce the same paths again. glob follows
+        # them until the path is too long.
+        subdir_real = os.path.realpath(path) if is_symlink else os.path.join(real, name)
+        key = (subdir_real, frozenset(matched))
+        if key in active:
+            continue
+        active.add(key)
+        yield from _walk(path, subdir_real, matched, patterns, active)
+        active.remove(key)
+
+
+def discover(patterns):
+    """
+    Yield (index, path) for every path matching patterns[index], in the
+    same way as glob.glob(pattern, recursive=True). Paths are yielded as
+    they are found by the walk, which is not the order used by glob,
+    and the paths of different patterns may be interleaved.
+
+    Patterns are grouped by the directories they are rooted in, and all
+    of the patterns in a group are matched together in a single walk of
+    the directory tree with os.scandir.
+    """
+    groups = {}
+    for (index, pattern) in enumerate(patterns):
+        split = _split_pattern(pattern)
+        if split is None:
+            for path in glob.glob(pattern, recursive=True):
+                yield (index, path)
+            continue
+        (base, components) = split
+        groups.setdefault(base, []).append((index, components))
+
+    # Patterns rooted below another group's base join that group
+    roots = {}
+    for base in sorted(groups, key=len):
+        for root in roots:
+            prefix = root if root.endswith(os.sep) else root + os.sep
+            if base.startswith(prefix):
+                extra = [os.path.normcase(part) for part in base[len(prefix):].split(os.sep)]
+                roots[root] += [(index, extra + components)
+                                for (index, components) in groups[base]]
+                break
+        else:
+            roots[base] = list(groups[base])
+
+    for (root, members) in roots.items():
+        if not os.path.isdir(root):
+            continue
+        patterns_by_index = {index: components for (index, components) in members}
+        states = _closure({(index, 0) for index in patterns_by_index}, patterns_by_index)
+        for (index, pos) in states:
+            if pos == len(patterns_by_index[index]):
+                yield (index, root)
+        real = os.path.realpath(root)
+        yield from _walk(root, real, states, patterns_by_index, {(real, frozenset(states))})
+
+
+def expand_paths(patterns):
+    """
+    Return a dict mapping each pattern to a sorted list of the valid and
+    existing paths that match it, walking each directory tree once.
+    """
+    patterns = list(dict.fromkeys(patterns))
+    matches = [[] for _ in patterns]
+    for (index, path) in discover(patterns):
+        matches[index].append(path)
+
+    expanded = {}
+    for (pattern, paths) in zip(patterns, matches):
+        if paths == []:
+            log.warning("Couldn't find files matching '%s' -- ignoring it.", pattern)
+        expanded[pattern] = sorted(os.path.realpath(path)
+                                   for path in filter(util.valid_path, paths))
+    return expanded
+
+
 def flatten(nested_list):
     """
     Flatten an arbitrarily nested list.
@@ -238,10 +495,11 @@ def flatten(nested_list):
     return flattened
 
 
-def load_codebase(config, rootdir):
+def load_codebase(config, rootdir, expand=expand_path):
     """
     Load the code base definition into a Python object.
     Return a dict of files and platform names.
+    expand is used to find the paths matching each pattern.
     """
     # Ensure expected values are present, or provide defaults
     cfg_codebase = config["codebase"]
@@ -252,12 +510,12 @@ def load_codebase(config, rootdir):
     if "platforms" not in cfg_codebase or cfg_codebase["platforms"] == []:
         raise RuntimeError("Empty 'platforms' section found in codebase definition!")
 
-    codebase = {"files": list(it.chain(*(expand_path(os.path.join(rootdir, f))
+    codebase = {"files": list(it.chain(*(expand(os.path.join(rootdir, f))
                                          for f in cfg_codebase["files"]))),
                 "platforms": cfg_codebase["platforms"]}
 
     if "exclude_files" in cfg_codebase:
-        codebase["exclude_files"] = frozenset(it.chain(*(expand_path(os.path.join(rootdir, f))
+        codebase["exclude_files"] = frozenset(it.chain(*(expand(os.path.join(rootdir, f))
                                                          for f in cfg_codebase["exclude_files"])))
     else:
         codebase["exclude_files"] = frozenset([])
@@ -270,73 +528,189 @@ def load_codebase(config, rootdir):
     return codebase
 
 
+_json_whitespace = re.compile(r"[ \t\n\r]*")
+
+
+def _iter_json_array(fp, chunk_size=1 << 20):
+    """
+    Yield the elements of the JSON array in fp one at a time, reading
+    the file in chunks instead of loading it all at once.
+    Raise ValueError if the file does not contain an array.
+    """
+    decoder = json.JSONDecoder()
+    buffer = fp.read(chunk_size)
+    eof = not buffer
+
+    def skip(pos):
+        nonlocal buffer, eof
+        while True:
+            pos = _json_whitespace.match(buffer, pos).end()
+            if pos < len(buffer) or eof:
+                return pos
+            buffer = fp.read(chunk_size)
+            eof = not buffer
+            pos = 0
+
+    pos = skip(0)
+    if buffer[pos:pos + 1] != "[":
+        # Distinguish invalid JSON from valid JSON that is not an array
+        json.loads(buffer[pos:] + fp.read())
+        raise ValueError("Compilation database failed schema validation")
+    pos = skip(pos + 1)
+    if buffer[pos:pos + 1] == "]":
+        pos += 1
+    else:
+        size = chunk_size
+        while True:
+            # A value is only complete once the delimiter that follows it
+            # has been read, since a number may continue in the next chunk.
+            try:
+                (value, end) = decoder.raw_decode(buffer, pos)
+                delimiter = _json_whitespace.match(buffer, end).end()
+                complete = buffer[delimiter:delimiter + 1] in (",", "]") or eof
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                complete = False
+            if not complete:
+                data = fp.read(size)
+                eof = not data
+                buffer = buffer[pos:] + data
+                pos = 0
+                size *= 2
+                continue
+            size = chunk_size
+            yield value
+
+            pos = skip(end)
+            if buffer[pos:pos + 1] == "]":
+                pos += 1
+                break
+            if buffer[pos:pos + 1] != ",":
+                raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos)
+            pos = skip(pos + 1)
+
+    pos = skip(pos)
+    if pos < len(buffer):
+        raise json.JSONDecodeError("Extra data", buffer, pos)
+
+
+def _valid_command(e):
+    """
+    Return true if e is a valid compilation database entry, following
+    the same rules as the compilation database schema.
+    """
+    if not isinstance(e, dict):
+        return False
+    for key in ["directory", "file", "command", "output"]:
+        if key in e and not isinstance(e[key], str):
+            return False
+    if "arguments" in e:
+        arguments = e["arguments"]
+        if not isinstance(arguments, list) or not all(isinstance(a, str) for a in arguments):
+            return False
+    return "arguments" in e or "command" in e
+
+
+def _real_file(path, directories):
+    """
+    Return the real path of a file, reusing the real paths of the
+    directories in the directories dict, or None if it doesn't exist.
+    """
+    (head, tail) = os.path.split(path)
+    if tail in ("", os.curdir, os.pardir):
+        path = os.path.realpath(path)
+        return path if os.path.exists(path) else None
+
+    if head not in directories:
+        directories[head] = os.path.realpath(head)
+    path = os.path.join(directories[head], tail)
+    try:
+        if not os.path.islink(path):
+            os.stat(path)
+            return path
+    except OSError:
+        return None
+    path = os.path.realpath(path)
+    return path if os.path.exists(path) else None
+
+
 def load_database(dbpath, rootdir):
     """
     Load a compilation database.
     Return a list of compilation commands, where each command is
     represented as a compilation database entry.
-    """
-    with util.safe_open_read_nofollow(dbpath, 'r') as fi:
-        db = json.load(fi)
-
-    # Validate compilation database against schema
-    try:
-        jsonschema.validate(instance=db, schema=_compiledb_schema)
-    except Exception:
-        msg = "Compilation database failed schema validation"
-        raise ValueError(msg)
 
+    The database is parsed one entry at a time, and entries with
+    identical flags share the same lists of defines, include paths and
+    include files.
+    """
     configuration = []
-    for e in db:
-        # Database may not have tokenized arguments
-        if "command" in e:
-            args = shlex.split(e["command"])
-        elif "arguments" in e:
-            args = e["arguments"]
-
-        # Extract defines, include paths and include files
-        # from command-line arguments
-        defines = extract_defines(args)
-        include_paths = extract_include_paths(args)
-        include_files = extract_include_files(args)
-
-        # Include paths may be specified relative to root
-        include_paths = [os.path.realpath(os.path.join(rootdir, f)) for f in include_paths]
-
-        # Files may be specified:
-        # - relative to root
-        # - relative to a directory
-        # - as an absolute path
-        filedir = rootdir
-        if "directory" in e:
-            if os.path.isabs(e["directory"]):
-                filedir = e["directory"]
+    flags = {}
+    real_paths = {}
+    directories = {}
+    with util.safe_open_read_nofollow(dbpath, 'r') as fi:
+        for e in _iter_json_array(fi):
+            # Validate each entry against the rules of the schema
+            if not _valid_command(e):
+                msg = "Compilation database failed schema validation"
+                raise ValueError(msg)
+
+            # Database may not have tokenized arguments
+            if "command" in e:
+                args = split_command(e["command"])
+            elif "arguments" in e:
+                args = e["arguments"]
+
+            # Extract defines, include paths and include files
+            # from command-line arguments
+            (defines, include_paths, include_files) = extract_flags(args)
+            key = (tuple(defines), tuple(include_paths), tuple(include_files))
+            if key not in flags:
+                # Include paths may be specified relative to root
+                for f in include_paths:
+                    if f not in real_paths:
+                        real_paths[f] = os.path.realpath(os.path.join(rootdir, f))
+                include_paths = [real_paths[f] for f in include_paths]
+                flags[key] = (defines, include_paths, include_files)
+            (defines, include_paths, include_files) = flags[key]
+
+            # Files may be specified:
+            # - relative to root
+            # - relative to a directory
+            # - as an absolute path
+            filedir = rootdir
+            if "directory" in e:
+                if os.path.isabs(e["directory"]):
+                    filedir = e["directory"]
+                else:
+                    filedir = os.path.realpath(rootdir, os.path.join(e["directory"]))
+
+            if os.path.isabs(e["file"]):
+                path = e["file"]
             else:
-                filedir = os.path.realpath(rootdir, os.path.join(e["directory"]))
+                path = os.path.join(filedir, e["file"])
 
-        if os.path.isabs(e["file"]):
-            path = os.path.realpath(e["file"])
-        else:
-            path = os.path.realpath(os.path.join(filedir, e["file"]))
-
-        # Compilation database may contain files that don't
-        # exist without running make
-        if os.path.exists(path):
-            configuration += [{"file": path,
-                               "defines": defines,
-                               "include_paths": include_paths,
-                               "include_files": include_files}]
-        else:
-            log.warning("Couldn't find file %s -- ignoring it.", path)
+            # Compilation database may contain files that don't
+            # exist without running make
+            real_path = _real_file(path, directories)
+            if real_path is not None:
+                configuration += [{"file": real_path,
+                                   "defines": defines,
+                                   "include_paths": include_paths,
+                                   "include_files": include_files}]
+            else:
+                log.warning("Couldn't find file %s -- ignoring it.", os.path.realpath(path))
 
     return configuration
 
 
-def load_platform(config, rootdir, platform_name):
+def load_platform(config, rootdir, platform_name, expand=expand_path):
     """
     Load the platform specified by platform_name into a Python object.
     Return a list of compilation commands, where each command is
     represented as a compilation database entry.
+    expand is used to find the paths matching each pattern.
     """
     # Ensure expected values are present, or provide defaults
     cfg_platform = config[platform_name]
@@ -368,7 +742,7 @@ def load_platform(config, rootdir, platform_name):
                    for d in flatten(cfg_platform["defines"])]
 
         for f in flatten(cfg_platform["files"]):
-            for path in expand_path(os.path.join(rootdir, f)):
+            for path in expand(os.path.join(rootdir, f)):
                 configuration += [{"file": path,
                                    "defines": defines,
                                    "include_paths": include_paths,
@@ -387,11 +761,30 @@ def load_platform(config, rootdir, platform_name):
     return configuration
 
 
+def _config_patterns(config):
+    """
+    Return all of the file patterns in a configuration, so that they
+    can be expanded together.
+    """
+    patterns = []
+    cfg_codebase = config["codebase"] or {}
+    patterns += cfg_codebase.get("files", [])
+    patterns += cfg_codebase.get("exclude_files", [])
+    for platform_name in cfg_codebase.get("platforms", []):
+        cfg_platform = config.get(platform_name)
+        if cfg_platform and "files" in cfg_platform:
+            patterns += flatten(cfg_platform["files"])
+    return patterns
+
+
 def load(config_file, rootdir):
     """
     Load the configuration file into Python objects.
     Return a (codebase, platform configuration) tuple of dicts.
     """
+    import jsonschema
+    import yaml
+
     if os.path.isfile(config_file):
         with util.safe_open_read_nofollow(config_file, 'r') as f:
             config = yaml.safe_load(f)
@@ -408,7 +801,8 @@ def load(config_file, rootdir):
 
     # Read codebase definition
     if "codebase" in config:
-        codebase = load_codebase(config, rootdir)
+        expanded = expand_paths(os.path.join(rootdir, f) for f in _config_patterns(config))
+        codebase = load_codebase(config, rootdir, expanded.__getitem__)
     else:
         raise RuntimeError("Missing 'codebase' section in config file!")
 
@@ -417,6 +811,7 @@ def load(config_file, rootdir):
     # Read each platform definition and populate platform configuration
     configuration = collections.defaultdict(list)
     for platform_name in codebase["platforms"]:
-        configuration[platform_name] = load_platform(config, rootdir, platform_name)
+        configuration[platform_name] = load_platform(config, rootdir, platform_name,
+                                                     expanded.__getitem__)
 
     return codebase, configuration
@@ -5,6 +5,7 @@ Contains classes and functions related to parsing a file,
 and building a tree of nodes from it.
 """
 
+import io
 import os
 from codebasin.file_source import get_file_source
 from . import preprocessor  # pylint : disable=no-name-in-module
@@ -126,10 +127,13 @@ class FileParser:
         new_node.num_lines = line_group.line_count
         tree.insert(new_node)
 
-    def parse_file(self, *, summarize_only=True):
+    def parse_file(self, *, summarize_only=True, data=None):
         """
         Parse the file that this parser points at, build a SourceTree
         representing this file, and return it.
+
+        If data is provided, it is used as the contents of the file
+        (as bytes) instead of reading the file.
         """
 
         filename = self._filename
@@ -138,7 +142,11 @@ class FileParser:
         if not file_source:
             raise RuntimeError(f"{filename} doesn't appear " +
                                "to be a language this tool can process")
-        with util.safe_open_read_nofollow(filename, mode='r', errors='replace') as source_file:
+        if data is None:
+            source_file = util.safe_open_read_nofollow(filename, mode='r', errors='replace')
+        else:
+            source_file = io.TextIOWrapper(io.BytesIO(data), errors='replace')
+        with source_file:
 
             groups = {'code': LineGroup(),
                       'directive': LineGroup(),
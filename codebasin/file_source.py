@@ -6,6 +6,7 @@ C/C++ files as well as fixed-form Fortran
 """
 
 import itertools as it
+import re
 from .language import FileLanguage
 
 # This string was created by looking at all unicode code points
@@ -278,6 +279,143 @@ class c_cleaner:
                 raise RuntimeError("Unknown parser state!")
 
 
+class fast_c_cleaner(c_cleaner):
+    """
+    Equivalent to c_cleaner, but processes a whole physical line at a
+    time, using regular expressions to skip over runs of characters that
+    do not change the state. The output (including the contents of
+    outbuf and the state stack) is identical to that of c_cleaner, which
+    is kept as the reference implementation.
+    """
+
+    # Characters that change the state, for each state
+    _toplevel_re = re.compile(r"[\\/\"'#]")
+    _directives_only_re = re.compile(r"[\\#]")
+    _directive_re = re.compile(r"[\\/\"']")
+    _double_quotation_re = re.compile(r'[\\"]')
+    _single_quotation_re = re.compile(r"[\\/']")
+
+    # Splits text into alternating runs of non-whitespace and whitespace
+    _whitespace_re = re.compile(r"(\s+)")
+
+    def _append_text(self, text):
+        """
+        Equivalent to calling append_char for each character in text.
+        """
+        obuf = self.outbuf
+        for (i, run) in enumerate(self._whitespace_re.split(text)):
+            if i % 2:
+                obuf.append_space()
+            elif run:
+                obuf.parts.extend(run)
+                obuf.trailing_space = False
+
+    def process(self, lineiter):
+        """
+        Add contents of lineiter to outbuf, stripping as directed.
+        lineiter is expected to be a string.
+        """
+        # pylint: disable=too-many-branches,too-many-statements
+        line = lineiter
+        if not isinstance(line, str):
+            line = "".join(line)
+        state = self.state
+        obuf = self.outbuf
+        pos = 0
+        n = len(line)
+        while pos < n:
+            top = state[-1]
+            if top in ("TOPLEVEL", "CPP_DIRECTIVE"):
+                if top == "CPP_DIRECTIVE":
+                    special = self._directive_re
+                elif self.directives_only:
+                    special = self._directives_only_re
+                else:
+                    special = self._toplevel_re
+                match = special.search(line, pos)
+                end = match.start() if match else n
+                if end > pos:
+                    self._append_text(line[pos:end])
+                if not match:
+                    return
+                char = line[end]
+                pos = end + 1
+                if char == '\\':
+                    state.append("ESCAPING")
+                    obuf.append_nonspace(char)
+                elif char == '/':
+                    state.append("FOUND_SLASH")
+                elif char == '"':
+                    state.append("DOUBLE_QUOTATION")
+                    obuf.append_nonspace(char)
+                elif char == '\'':
+                    state.append("SINGLE_QUOTATION")
+                    obuf.append_nonspace(char)
+                elif obuf.category() == "BLANK":
+                    state.append("CPP_DIRECTIVE")
+                    obuf.append_nonspace(char)
+                else:
+                    obuf.append_nonspace(char)
+            elif top in ("DOUBLE_QUOTATION", "SINGLE_QUOTATION"):
+                if top == "DOUBLE_QUOTATION":
+                    match = self._double_quotation_re.search(line, pos)
+                else:
+                    match = self._single_quotation_re.search(line, pos)
+                end = match.start() if match else n
+                if end > pos:
+                    obuf.parts.extend(line[pos:end])
+                    obuf.trailing_space = False
+                if not match:
+                    return
+                char = line[end]
+                pos = end + 1
+                if char == '\\':
+                    state.append("ESCAPING")
+                    obuf.append_nonspace(char)
+                elif char == '/':
+                    state.append("FOUND_SLASH")
+                else:
+                    state.pop()
+                    obuf.append_nonspace(char)
+            elif top == "FOUND_SLASH":
+                char = line[pos]
+                state.pop()
+                if char == '/':
+                    state.append("IN_INLINE_COMMENT")
+                    return
+                if char == '*':
+                    state.append("IN_BLOCK_COMMENT")
+                    pos += 1
+                else:
+                    obuf.append_char('/')
+            elif top == "IN_BLOCK_COMMENT":
+                end = line.find("*/", pos)
+                if end == -1:
+                    if line[n - 1] == '*':
+                        state.append("IN_BLOCK_COMMENT_FOUND_STAR")
+                    return
+                state.pop()
+                obuf.append_space()
+                pos = end + 2
+            elif top == "IN_BLOCK_COMMENT_FOUND_STAR":
+                char = line[pos]
+                pos += 1
+                if char == '/':
+                    state.pop()
+                    state.pop()
+                    obuf.append_space()
+                elif char != '*':
+                    state.pop()
+            elif top == "ESCAPING":
+                obuf.append_nonspace(line[pos])
+                state.pop()
+                pos += 1
+            elif top == "IN_INLINE_COMMENT":
+                return
+            else:
+                raise RuntimeError("Unknown parser state!")
+
+
 class fortran_cleaner:
     """
     'Cleans' source to remove comments and blanks while preserving
@@ -454,7 +592,7 @@ class line_info:
                 self.local_sloc, self.flushed_line, self.category)
 
 
-def c_file_source(fp, relaxed=False, directives_only=False):
+def c_file_source(fp, relaxed=False, directives_only=False, cleaner_class=fast_c_cleaner):
     """
     Process file fp in terms of logical (sloc) and physical lines of C code.
     Yield blocks of logical lines of code with physical extents.
@@ -463,10 +601,11 @@ def c_file_source(fp, relaxed=False, directives_only=False):
     special composition cases.
     directives_only sets up parser to only process directive lines such that
     the output can be fed to another file source (i.e. Fortran).
+    cleaner_class selects the cleaner implementation (e.g. c_cleaner).
     """
 
     current_physical_line = one_space_line()
-    cleaner = c_cleaner(current_physical_line, directives_only)
+    cleaner = cleaner_class(current_physical_line, directives_only)
 
     curr_line = line_info()
 
@@ -484,7 +623,7 @@ def c_file_source(fp, relaxed=False, directives_only=False):
         continued = end > 0 and line[end - 1] == '\\'
         if continued:
             end -= 1
-        cleaner.process(it.islice(line, 0, end))
+        cleaner.process(line[:end])
         if not continued and cleaner.state[-1] != 'IN_BLOCK_COMMENT':
             cleaner.logical_newline()
 
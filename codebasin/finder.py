@@ -7,12 +7,16 @@ and parsing source files as part of a code base.
 
 import logging
 import collections
+import collections.abc
+import itertools as it
 import os
 
 from . import file_parser
 from . import platform
 from . import preprocessor
 from . import util
+from .codebase import CodeBaseIndex
+from .preprocessor import CodeNode
 from .walkers.tree_associator import TreeAssociator
 
 log = logging.getLogger("codebasin")
@@ -29,20 +33,125 @@ class FileInfo():
         self.sha = sha
 
 
+class NodeAssociationMap(collections.abc.Mapping):
+    """
+    A read-only view of the platforms associated with each node of a
+    tree. Associations are stored as integer bitmasks, and presented as
+    frozensets of platform names.
+    """
+
+    def __init__(self, masks, state):
+        self.masks = masks
+        self._state = state
+
+    def __getitem__(self, node):
+        return self._state.platform_set(self.masks.get(node, 0))
+
+    def __contains__(self, node):
+        return node in self.masks
+
+    def __iter__(self):
+        return iter(self.masks)
+
+    def __len__(self):
+        return len(self.masks)
+
+
+def _parse_file(fn, summarize_only, cache=None, data=None):
+    """
+    Build a SourceTree for a single source file, or load it from the
+    parse cache if one is provided. If data is provided, it is used as
+    the contents of the file instead of reading it again.
+    Defined at module scope so that it can be dispatched to a
+    process pool.
+    """
+    if cache is not None:
+        tree = cache.load(fn, summarize_only)
+        if tree is not None:
+            return tree
+
+    parser = file_parser.FileParser(fn)
+    tree = parser.parse_file(summarize_only=summarize_only, data=data)
+
+    if cache is not None:
+        cache.store(fn, tree, summarize_only)
+    return tree
+
+
+def _read_ahead(filenames, window, workers=16):
+    """
+    Yield (filename, contents) for each of filenames in order, reading
+    up to window files ahead in a pool of threads, so that the latency
+    of opening and reading files (e.g. on a network filesystem) is
+    hidden. The contents are None if a file could not be read.
+    """
+    from concurrent.futures import ThreadPoolExecutor
+
+    def read(fn):
+        try:
+            return util.read_file(fn)
+        except OSError:
+            # Let the parser report the error in the usual way
+            return None
+
+    pending = collections.deque()
+    filenames = iter(filenames)
+    with ThreadPoolExecutor(max_workers=min(workers, window)) as executor:
+        try:
+            for fn in it.islice(filenames, window):
+                pending.append((fn, executor.submit(read, fn)))
+            while pending:
+                (fn, future) = pending.popleft()
+                for next_fn in it.islice(filenames, 1):
+                    pending.append((next_fn, executor.submit(read, next_fn)))
+                yield (fn, future.result())
+        finally:
+            # Do not wait for files that will never be consumed
+            for (_, future) in pending:
+                future.cancel()
+
+
 class ParserState():
     """
     Keeps track of the overall state of the parser.
     Contains all of the SourceTree objects created from parsing the
     source files, along with association maps, that associate nodes to
     platforms.
+
+    Platforms are numbered in the order they are first seen, and each
+    node's associations are stored as an integer bitmask.
+
+    If a ParseCache is provided, trees are loaded from it when possible.
+
+    Walks of header files are summarized, so that a header reached again
+    with the same relevant platform state can be replayed instead of
+    walked.
+
+    Trees can be released to save memory, keeping only a compact record
+    of their associations. A released tree that is needed again is
+    rebuilt, and its associations restored from the record.
+
+    When several files are inserted at once, up to prefetch files are
+    read ahead of the parser by a pool of threads.
     """
 
-    def __init__(self, summarize_only):
+    def __init__(self, summarize_only, cache=None):
         self.trees = {}
         self.maps = {}
+        self.platforms = []
+        self._platform_bits = {}
+        self._platform_sets = {0: frozenset()}
         self.summarize_only = summarize_only
+        self.cache = cache
+        self.include_cache = platform.IncludeCache()
         self.fileinfo = collections.defaultdict(list)
         self.merge_duplicates = True
+        self.header_summaries = collections.defaultdict(list)
+        self.summarize_headers = True
+        self._summary_keys = collections.defaultdict(set)
+        self.released = {}
+        self.restored = []
+        self.prefetch = 64
 
     def _map_filename(self, fn):
         """
@@ -93,9 +202,131 @@ class ParserState():
         """
         fn = self._map_filename(fn)
         if fn not in self.trees:
-            parser = file_parser.FileParser(fn)
-            self.trees[fn] = parser.parse_file(summarize_only=self.summarize_only)
-            self.maps[fn] = collections.defaultdict(set)
+            self._insert_tree(fn, _parse_file(fn, self.summarize_only, self.cache))
+
+    def insert_files(self, filenames, jobs=1):
+        """
+        Build new trees for a list of source files, and create an
+        association map for each of them.
+
+        If jobs > 1, files are parsed in parallel using a pool of
+        worker processes. Trees are inserted in the same order as the
+        serial path, so results do not depend on the number of jobs.
+        Otherwise, files are read ahead of the parser (see prefetch).
+        """
+        pending = []
+        seen = set()
+        for fn in filenames:
+            fn = self._map_filename(fn)
+            if fn not in self.trees and fn not in seen:
+                pending.append(fn)
+                seen.add(fn)
+
+        if len(pending) <= 1:
+            for fn in pending:
+                self._insert_tree(fn, _parse_file(fn, self.summarize_only, self.cache))
+            return
+
+        if jobs <= 1:
+            # Only read ahead the files that the cache cannot provide
+            # without reading them
+            resident = {}
+            if self.cache is not None:
+                for fn in pending:
+                    tree = self.cache.load_resident(fn, self.summarize_only)
+                    if tree is not None:
+                        resident[fn] = tree
+            unread = [fn for fn in pending if fn not in resident]
+            if self.prefetch <= 1:
+                contents = zip(unread, it.repeat(None))
+            else:
+                contents = _read_ahead(unread, self.prefetch)
+
+            for fn in pending:
+                if fn in resident:
+                    tree = resident[fn]
+                else:
+                    (_, data) = next(contents)
+                    tree = _parse_file(fn, self.summarize_only, self.cache, data)
+                self._insert_tree(fn, tree)
+            return
+
+        # Send work to the pool in batches, to amortize the cost of
+        # transferring trees back to this process.
+        from concurrent.futures import ProcessPoolExecutor
+
+        chunksize = max(1, len(pending) // (4 * jobs))
+        with ProcessPoolExecutor(max_workers=jobs) as executor:
+            trees = executor.map(_parse_file, pending, it.repeat(self.summarize_only),
+                                 it.repeat(self.cache), chunksize=chunksize)
+            for (fn, tree) in zip(pending, trees):
+                self._insert_tree(fn, tree)
+
+    def associate_header(self, fn, file_platform):
+        """
+        Associate the nodes of the header file fn with a platform,
+        updating the platform's definitions. Replays a previous walk of
+        the header if the platform state it read is unchanged.
+        """
+        if not self.summarize_headers:
+            associator = TreeAssociator(self.get_tree(fn), self.get_masks(fn))
+            associator.walk(file_platform, self)
+            return
+
+        key = (fn, file_platform.include_key())
+        summaries = self.header_summaries[key]
+        for summary in summaries:
+            if summary.matches(file_platform):
+                summary.replay(file_platform, self)
+                return
+
+        summary = platform.HeaderSummary()
+        file_platform.recorders.append(summary)
+        try:
+            associator = TreeAssociator(self.get_tree(fn), self.get_masks(fn))
+            associator.walk(file_platform, self)
+        finally:
+            file_platform.recorders.pop()
+        summaries.append(summary)
+        for visited in summary.visits:
+            self._summary_keys[visited].add(key)
+
+    def _insert_tree(self, fn, tree):
+        """
+        Insert a tree built for the (internal) filename fn, and create
+        an empty association map for it. If the file was previously
+        released, its associations are restored and it is added to the
+        list of restored files.
+        """
+        self.trees[fn] = tree
+        self.maps[fn] = collections.defaultdict(int)
+
+        record = self.released.pop(fn, None)
+        if record is not None:
+            node_associations = self.maps[fn]
+            for (node, mask) in zip(tree.nodes(), record):
+                if mask:
+                    node_associations[node] = mask
+            self.restored.append((fn, record))
+
+    def release_file(self, fn):
+        """
+        Remove the tree built for the (internal) filename fn, and return
+        a (tree, record) tuple, where record lists the association
+        bitmask of each node in pre-order.
+        """
+        tree = self.trees.pop(fn)
+        node_associations = self.maps.pop(fn)
+        record = [node_associations.get(node, 0) for node in tree.nodes()]
+        self.released[fn] = record
+
+        # Header summaries refer to the released nodes, and cannot be
+        # replayed once the tree has been rebuilt.
+        filename = tree.root.filename
+        for key in self._summary_keys.pop(filename, ()):
+            self.header_summaries[key] = [summary for summary in self.header_summaries[key]
+                                          if filename not in summary.visits]
+        return (tree, record)
 
     def get_filenames(self):
         """
@@ -116,58 +347,342 @@ class ParserState():
         """
         Return the NodeAssociationMap associated with a filename
         """
+        masks = self.get_masks(fn)
+        if masks is None:
+            return None
+        return NodeAssociationMap(masks, self)
+
+    def get_masks(self, fn):
+        """
+        Return the dict mapping each node of a file to the bitmask of
+        its associated platforms.
+        """
         fn = self._map_filename(fn)
-        if fn not in self.maps:
+        if fn not in self.trees:
             return None
         return self.maps[fn]
 
+    def platform_bit(self, name):
+        """
+        Return the bit representing the named platform in association
+        bitmasks, numbering the platform if it has not been seen before.
+        """
+        bit = self._platform_bits.get(name)
+        if bit is None:
+            bit = 1 << len(self.platforms)
+            self.platforms.append(name)
+            self._platform_bits[name] = bit
+        return bit
 
-def find(rootdir, codebase, configuration, *, summarize_only=True):
+    def platform_set(self, mask):
+        """
+        Return the frozenset of platform names represented by a bitmask.
+        """
+        names = self._platform_sets.get(mask)
+        if names is None:
+            names = frozenset(name for (i, name) in enumerate(self.platforms) if mask >> i & 1)
+            self._platform_sets[mask] = names
+        return names
+
+
+def associate(state, rootdir, platform_name, entry, recorder=None):
+    """
+    Associate the nodes reachable from a single compilation command
+    (i.e. a compilation database entry) with the named platform.
+    If a HeaderSummary recorder is provided, it records everything that
+    the command reads from the platform.
+    """
+    file_platform = platform.Platform(platform_name, rootdir, state.include_cache)
+    if recorder is not None:
+        file_platform.recorders.append(recorder)
+
+    for path in entry['include_paths']:
+        file_platform.add_include_path(path)
+
+    for definition in entry['defines']:
+        macro = preprocessor.macro_from_definition_string(definition)
+        file_platform.define(macro.name, macro)
+
+    # Process include files.
+    # These modify the file_platform instance, but we throw away
+    # the active nodes after processing is complete.
+    for include in entry['include_files']:
+        include_file = file_platform.find_include_file(include,
+                                                       os.path.dirname(entry["file"]))
+        if include_file:
+            state.insert_file(include_file)
+            state.associate_header(include_file, file_platform)
+
+    # Process the file, to build a list of associate nodes
+    associator = TreeAssociator(state.get_tree(entry['file']),
+                                state.get_masks(entry['file']))
+    associator.walk(file_platform, state)
+
+
+# State used by each association worker process.
+# The parent's ParserState is copied once into each worker, and any new
+# trees the worker builds are sent back to the parent once.
+_worker_state = None
+_worker_sent = None
+
+
+def _init_association_worker(state):
+    """
+    Initialize an association worker with a copy of the parser state.
+    """
+    # pylint: disable=global-statement
+    global _worker_state, _worker_sent
+    _worker_state = state
+    _worker_sent = set(state.get_filenames())
+
+
+def _associate_shard(rootdir, platform_name, entries):
+    """
+    Associate a shard of compilation commands with the named platform.
+    Return a (trees, associations) tuple, where trees contains any trees
+    not previously known to the parent, and associations maps each
+    filename to the pre-order indices of its associated nodes.
+    """
+    state = _worker_state
+    for e in entries:
+        associate(state, rootdir, platform_name, e)
+
+    trees = {}
+    for fn in state.get_filenames():
+        if fn not in _worker_sent:
+            trees[fn] = state.trees[fn]
+            _worker_sent.add(fn)
+
+    # Only this shard's platform is recorded, so the maps can be reset
+    # for the next shard assigned to this worker.
+    associations = {}
+    for fn in state.get_filenames():
+        node_associations = state.maps[fn]
+        if not node_associations:
+            continue
+        associations[fn] = [index for (index, node) in enumerate(state.trees[fn].nodes())
+                            if node in node_associations]
+        node_associations.clear()
+
+    return (trees, associations)
+
+
+def _associate_parallel(state, rootdir, configuration, jobs):
+    """
+    Associate nodes with platforms using a pool of worker processes.
+
+    Each platform's compilation commands are split into shards, and each
+    shard is processed by a worker. Since a platform only ever adds its
+    own name to a node's association set, the per-node sets from each
+    shard can be combined with a union.
+    """
+    shards = []
+    nshards = -(-jobs // max(1, len(configuration)))
+    for p in configuration:
+        entries = configuration[p]
+        size = max(1, -(-len(entries) // nshards))
+        for start in range(0, len(entries), size):
+            shards.append((p, entries[start:start + size]))
+
+    from concurrent.futures import ProcessPoolExecutor
+
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_association_worker,
+                             initargs=(state,)) as executor:
+        futures = [executor.submit(_associate_shard, rootdir, p, entries)
+                   for (p, entries) in shards]
+
+        # Results are merged in submission order, so that trees are
+        # inserted in the same order as the serial path.
+        for ((p, _), future) in zip(shards, futures):
+            (trees, associations) = future.result()
+            for (fn, tree) in trees.items():
+                mapped_fn = state._map_filename(fn)
+                if mapped_fn not in state.trees:
+                    state._insert_tree(mapped_fn, tree)
+
+            bit = state.platform_bit(p)
+            for (fn, indices) in associations.items():
+                nodes = state.get_tree(fn).nodes()
+                node_associations = state.get_masks(fn)
+                for index in indices:
+                    node_associations[nodes[index]] |= bit
+
+
+def _associate_recorded(state, rootdir, platform_name, entry):
+    """
+    Associate a single compilation command with the named platform, and
+    return a (nodes, includes) tuple. nodes is a dict mapping each file
+    it reached to the pre-order indices of the nodes that it associated,
+    and includes maps each include file lookup it made to the result.
+    """
+    # Collect this command's associations in a separate set of maps,
+    # then merge them into the state.
+    maps = state.maps
+    state.maps = collections.defaultdict(lambda: collections.defaultdict(int))
+    recorder = platform.HeaderSummary()
+    try:
+        associate(state, rootdir, platform_name, entry, recorder)
+        recorded = state.maps
+    finally:
+        state.maps = maps
+
+    nodes = {}
+    for (fn, node_associations) in recorded.items():
+        if fn not in maps:
+            maps[fn] = collections.defaultdict(int)
+        for (node, mask) in node_associations.items():
+            maps[fn][node] |= mask
+        nodes[fn] = [index for (index, node) in enumerate(state.trees[fn].nodes())
+                     if node in node_associations]
+    return (nodes, recorder.includes)
+
+
+def _associate_incremental(state, rootdir, configuration, history):
+    """
+    Associate nodes with platforms, replaying the result of any
+    compilation command recorded in the history whose inputs have not
+    changed since the previous run.
+    """
+    for p in configuration:
+        bit = state.platform_bit(p)
+        for e in configuration[p]:
+            nodes = history.lookup(p, e, state.include_cache)
+            if nodes is None:
+                history.update(p, e, *_associate_recorded(state, rootdir, p, e))
+                continue
+
+            for (fn, indices) in nodes.items():
+                state.insert_file(fn)
+                tree_nodes = state.get_tree(fn).nodes()
+                node_associations = state.get_masks(fn)
+                for index in indices:
+                    node_associations[tree_nodes[index]] |= bit
+
+
+def find(rootdir, codebase, configuration, *, summarize_only=True, jobs=1, cache=None,
+         history=None, include_cache=None):
     """
     Find codepaths in the files provided and return a mapping of source
     lines to platforms.
+
+    If jobs > 1, source files are parsed and associated with
+    platforms in parallel. If a ParseCache is provided, unchanged files
+    are loaded from the cache instead of being parsed. If an
+    AnalysisHistory is provided, compilation commands whose inputs are
+    unchanged since the previous run are replayed from the history
+    instead of being re-associated; the remaining commands are then
+    associated serially, whatever the value of jobs. If an
+    IncludeCache is provided, it is used (and updated) instead of a new
+    one.
     """
 
     # Build a tree for each unique file for all platforms.
-    state = ParserState(summarize_only)
-    for f in codebase["files"]:
-        state.insert_file(f)
+    state = ParserState(summarize_only, cache)
+    if include_cache is not None:
+        state.include_cache = include_cache
+    codebase_index = CodeBaseIndex.from_codebase(codebase)
+    filenames = list(codebase["files"])
     for p in configuration:
         for e in configuration[p]:
-            if e['file'] not in codebase["files"]:
+            if e['file'] not in codebase_index:
                 log.warning(
                     "%s found in definition of platform %s but missing from codebase",
                     e['file'], p)
-            state.insert_file(e['file'])
+            filenames.append(e['file'])
+    state.insert_files(filenames, jobs)
 
     # Process each tree, by associating nodes with platforms
-    for p in configuration:
-        for e in configuration[p]:
-            file_platform = platform.Platform(p, rootdir)
+    if history is not None:
+        if jobs > 1:
+            log.warning("Compilation commands are associated serially when an "
+                        "analysis history is used; jobs=%d only applies to parsing.", jobs)
+        _associate_incremental(state, rootdir, configuration, history)
+    elif jobs > 1:
+        _associate_parallel(state, rootdir, configuration, jobs)
+    else:
+        for p in configuration:
+            for e in configuration[p]:
+                associate(state, rootdir, p, e)
+
+    return state
+
 
-            for path in e['include_paths']:
-                file_platform.add_include_path(path)
+def _fold(setmap, counts, state, codebase_index, tree, record, sign=1):
+    """
+    Add (or, if sign is -1, remove) the lines of a tree to a setmap,
+    using the association bitmasks in record. counts tracks the number
+    of nodes contributing to each platform set, and codebase_index is the
+    CodeBaseIndex used to skip files outside the code base.
+    """
+    if codebase_index.excludes(tree.root.filename):
+        return
 
-            for definition in e['defines']:
-                macro = preprocessor.macro_from_definition_string(definition)
-                file_platform.define(macro.name, macro)
+    for (node, mask) in zip(tree.iter_nodes(), record):
+        if isinstance(node, CodeNode):
+            platform_set = state.platform_set(mask)
+            setmap[platform_set] += sign * node.num_lines
+            counts[platform_set] += sign
 
-            # Process include files.
-            # These modify the file_platform instance, but we throw away
-            # the active nodes after processing is complete.
-            for include in e['include_files']:
-                include_file = file_platform.find_include_file(include,
-                                                               os.path.dirname(e["file"]))
-                if include_file:
-                    state.insert_file(include_file)
 
-                    associator = TreeAssociator(state.get_tree(
-                        include_file), state.get_map(include_file))
-                    associator.walk(file_platform, state)
+def stream(rootdir, codebase, configuration, *, summarize_only=True, cache=None):
+    """
+    Find codepaths in the files provided and return a mapping of
+    platform sets to lines of code (i.e. a setmap), without retaining
+    every tree.
 
-            # Process the file, to build a list of associate nodes
-            associator = TreeAssociator(state.get_tree(e['file']),
-                                        state.get_map(e['file']))
-            associator.walk(file_platform, state)
+    Compilation commands are processed one at a time. Once a source
+    file has been processed by the last command that names it, its tree
+    is folded into the setmap and released. If a released file is later
+    reached (e.g. via #include), its tree is rebuilt and unfolded, and
+    is folded again after that command.
 
-    return state
+    Files that are only reached via #include (e.g. headers) are not
+    named by any command, so their trees are kept until every command
+    has been processed and are folded at the end. Memory use therefore
+    grows with the number of distinct headers reached, not just with
+    the size of the largest source file.
+    """
+    state = ParserState(summarize_only, cache)
+    setmap = collections.defaultdict(int)
+    counts = collections.defaultdict(int)
+    codebase_index = CodeBaseIndex.from_codebase(codebase)
+
+    commands = [(p, e) for p in configuration for e in configuration[p]]
+    last_use = {}
+    for (index, (p, e)) in enumerate(commands):
+        if e['file'] not in codebase_index:
+            log.warning(
+                "%s found in definition of platform %s but missing from codebase",
+                e['file'], p)
+        last_use[state._map_filename(e['file'])] = index
+    release_after = collections.defaultdict(list)
+    for (fn, index) in last_use.items():
+        release_after[index].append(fn)
+
+    for (index, (p, e)) in enumerate(commands):
+        state.insert_file(e['file'])
+        associate(state, rootdir, p, e)
+
+        for (fn, record) in state.restored:
+            _fold(setmap, counts, state, codebase_index, state.trees[fn], record, -1)
+        releasing = release_after.pop(index, [])
+        releasing += [fn for (fn, _) in state.restored if fn not in releasing]
+        state.restored = []
+
+        for fn in releasing:
+            (tree, record) = state.release_file(fn)
+            _fold(setmap, counts, state, codebase_index, tree, record)
+
+    # Files that were never released include headers, and files in the
+    # codebase that no command reached.
+    for fn in codebase["files"]:
+        fn = state._map_filename(fn)
+        if fn not in state.released:
+            state.insert_file(fn)
+    for fn in list(state.get_filenames()):
+        (tree, record) = state.release_file(fn)
+        _fold(setmap, counts, state, codebase_index, tree, record)
+
+    return collections.defaultdict(int, {platform_set: lines
+                                         for (platform_set, lines) in setmap.items()
+                                         if counts[platform_set]})
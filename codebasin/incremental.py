@@ -0,0 +1,153 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Contains classes and functions for incremental re-analysis, which
+reuses the associations computed by a previous run for compilation
+commands whose inputs have not changed.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+
+from . import cache
+from . import util
+
+log = logging.getLogger("codebasin")
+
+# The version of the history file format.
+version = 2
+
+
+def entry_key(platform_name, entry):
+    """
+    Return a string uniquely identifying a compilation command for a
+    platform.
+    """
+    return json.dumps([platform_name, entry["file"], list(entry["defines"]),
+                       list(entry["include_paths"]), list(entry["include_files"])])
+
+
+class AnalysisHistory():
+    """
+    Records, for each compilation command, the files that it reached
+    (with their content hashes), the include files that it looked up
+    (including those that were not found), and the nodes that it
+    associated with its platform.
+
+    A command can be replayed from the history if none of the files
+    that it reached have changed, and every include file that it looked
+    up still resolves to the same file.
+
+    If path is None, the history is only kept in memory, for the runs
+    made by a single process.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = {}
+        self.updated = {}
+        self.hits = 0
+        self.misses = 0
+
+        if path is None:
+            return
+
+        try:
+            with util.safe_open_read_nofollow(path, 'r') as f:
+                history = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError:
+            log.warning("Ignoring invalid analysis history %s", path)
+            return
+
+        if history.get("version") != version or history.get("parser") != cache.version:
+            log.info("Ignoring analysis history from a different version")
+            return
+        self.records = history["records"]
+
+    @staticmethod
+    def default_path(cache_dir, config_file, rootdir):
+        """
+        Return a path in cache_dir for the history of the code base
+        described by config_file and rootdir.
+        """
+        name = "{}\n{}".format(os.path.realpath(config_file), os.path.realpath(rootdir))
+        digest = hashlib.sha256(name.encode()).hexdigest()
+        return os.path.join(os.path.realpath(cache_dir), f"history-{digest[:16]}.json")
+
+    @staticmethod
+    def _unchanged(record, entry, include_cache):
+        """
+        Return True if the inputs of a recorded compilation command are
+        unchanged, using include_cache to resolve include files.
+        """
+        for (fn, digest) in record["files"].items():
+            try:
+                if util.compute_file_hash(fn) != digest:
+                    return False
+            except OSError:
+                return False
+
+        include_paths = tuple(entry["include_paths"])
+        for (filename, this_path, is_system_include, include_file) in record["includes"]:
+            if include_cache.find(filename, this_path, include_paths,
+                                  is_system_include) != include_file:
+                return False
+        return True
+
+    def lookup(self, platform_name, entry, include_cache):
+        """
+        Return the nodes associated by this compilation command in a
+        previous run, or None if any of its inputs have changed.
+        """
+        key = entry_key(platform_name, entry)
+        record = self.records.get(key)
+        if record is None or not self._unchanged(record, entry, include_cache):
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        self.updated[key] = record
+        return record["nodes"]
+
+    def update(self, platform_name, entry, nodes, includes):
+        """
+        Record the nodes associated by this compilation command.
+        nodes maps each file reached by the command to the pre-order
+        indices of the nodes it associated, and includes maps each
+        (filename, this_path, is_system_include) lookup it made to the
+        include file found (or None).
+        """
+        key = entry_key(platform_name, entry)
+        files = {fn: util.compute_file_hash(fn) for fn in nodes}
+        includes = [list(lookup) + [include_file]
+                    for (lookup, include_file) in includes.items()]
+        self.updated[key] = {"files": files, "includes": includes, "nodes": nodes}
+
+    def save(self):
+        """
+        Write the records for this run to disk, discarding records for
+        any compilation commands that no longer exist. The records are
+        also used for lookups in the next run.
+        """
+        self.records = self.updated
+        self.updated = {}
+        if self.path is None:
+            return
+
+        history = {"version": version, "parser": cache.version, "records": self.records}
+
+        directory = os.path.dirname(self.path)
+        os.makedirs(directory, mode=0o700, exist_ok=True)
+        (fd, tmp_path) = tempfile.mkstemp(dir=directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump(history, f)
+            os.replace(tmp_path, self.path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
@@ -5,22 +5,293 @@ Contains the Platform class used to specify definitions and include
 options for a specific platform.
 """
 
+import collections
 import os
 
 
+class HeaderSummary():
+    """
+    Records the interaction between a Platform and the walk of a header:
+    the platform state that the walk read before modifying it, the
+    include files that it looked up, the modifications it made, and the
+    nodes that it visited.
+
+    If a later walk of the same header starts from a platform that
+    agrees with everything that was read, the recorded modifications
+    and visits can be replayed instead of walking the header again.
+    """
+
+    def __init__(self):
+        self.reads = {}
+        self.skip_reads = {}
+        self.written = set()
+        self.skip_written = set()
+        self.includes = {}
+        self.effects = []
+        self.visits = collections.defaultdict(set)
+
+    def read(self, identifier, signature):
+        """
+        Record that a macro was read, unless its value was already
+        read or was set by this header.
+        """
+        if identifier not in self.written and identifier not in self.reads:
+            self.reads[identifier] = signature
+
+    def read_skip(self, fn, skipped):
+        """
+        Record that the skip status of an include file was read.
+        """
+        if fn not in self.skip_written and fn not in self.skip_reads:
+            self.skip_reads[fn] = skipped
+
+    def read_include(self, lookup, include_file):
+        """
+        Record the result of looking up an include file, where lookup
+        is a (filename, this_path, is_system_include) tuple.
+        """
+        if lookup not in self.includes:
+            self.includes[lookup] = include_file
+
+    def matches(self, platform):
+        """
+        Return True if the platform agrees with everything read by the
+        recorded walk.
+        """
+        for (fn, skipped) in self.skip_reads.items():
+            if (fn in platform._skip_includes) != skipped:
+                return False
+        for (identifier, signature) in self.reads.items():
+            if platform._signature(identifier) != signature:
+                return False
+        return True
+
+    def replay(self, platform, state):
+        """
+        Apply the recorded walk to the platform and to the association
+        maps in state, as if the header had been walked again.
+        """
+        # Re-issue the recorded reads, so that any enclosing recorders
+        # see the same dependencies as they would during a walk.
+        for identifier in self.reads:
+            platform.get_macro(identifier)
+        for fn in self.skip_reads:
+            platform.process_include(fn)
+        for lookup in self.includes:
+            platform.find_include_file(*lookup)
+
+        for effect in self.effects:
+            if effect[0] == "define":
+                platform.define(effect[1], effect[2])
+            elif effect[0] == "undefine":
+                platform.undefine(effect[1])
+            else:
+                platform.add_include_to_skip(effect[1])
+
+        bit = state.platform_bit(platform.name)
+        for (fn, nodes) in self.visits.items():
+            node_associations = state.get_masks(fn)
+            for node in nodes:
+                node_associations[node] |= bit
+            for summary in platform.recorders:
+                summary.visits[fn].update(nodes)
+
+
+class DirectoryIndex():
+    """
+    An in-memory index of directory contents, used to answer queries
+    about the existence of files without issuing system calls for each
+    query. Each directory is listed once, the first time it is queried.
+
+    Names are matched exactly, so on case-insensitive file systems an
+    include must match the case of the file on disk.
+
+    Listings are never invalidated automatically. Subclasses can provide
+    a different invalidation policy by overriding is_stale.
+    """
+
+    def __init__(self):
+        self._listings = {}
+
+    @staticmethod
+    def _list(path):
+        """
+        Return a (mtime, files, directories) tuple describing the
+        contents of the directory at path.
+        """
+        files = set()
+        directories = set()
+        try:
+            mtime = os.stat(path).st_mtime_ns
+            with os.scandir(path) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_file():
+                            files.add(entry.name)
+                        elif entry.is_dir():
+                            directories.add(entry.name)
+                    except OSError:
+                        pass
+        except OSError:
+            mtime = None
+        return (mtime, frozenset(files), frozenset(directories))
+
+    def _listing(self, path):
+        """
+        Return the (possibly cached) listing of the directory at path.
+        """
+        listing = self._listings.get(path)
+        if listing is None or self.is_stale(path, listing):
+            listing = self._list(path)
+            self._listings[path] = listing
+        return listing
+
+    # pylint: disable=no-self-use,unused-argument
+    def is_stale(self, path, listing):
+        """
+        Return True if the cached listing of the directory at path
+        must be refreshed. Return False by default.
+        """
+        return False
+
+    def invalidate(self, path=None):
+        """
+        Forget the listing of the directory at path, or of all
+        directories if path is None.
+        """
+        if path is None:
+            self._listings.clear()
+        else:
+            self._listings.pop(path, None)
+
+    def isfile(self, directory, filename):
+        """
+        Return True if 'filename', relative to 'directory', names an
+        existing file. Symbolic links are followed, as in
+        os.path.isfile.
+        """
+        parts = filename.replace(os.sep, "/").split("/")
+        if os.path.isabs(filename) or any(p in ["", ".", ".."] for p in parts):
+            return os.path.isfile(os.path.join(directory, filename))
+
+        for part in parts[:-1]:
+            (_, _, directories) = self._listing(directory)
+            if part not in directories:
+                return False
+            directory = os.path.join(directory, part)
+
+        (_, files, _) = self._listing(directory)
+        return parts[-1] in files
+
+
+class RevalidatingDirectoryIndex(DirectoryIndex):
+    """
+    A DirectoryIndex that refreshes the listing of a directory whenever
+    its modification time changes. Suitable for long-running processes,
+    at the cost of one system call per directory per query.
+    """
+
+    def is_stale(self, path, listing):
+        (mtime, _, _) = listing
+        try:
+            return os.stat(path).st_mtime_ns != mtime
+        except OSError:
+            return mtime is not None
+
+
+class IncludeCache():
+    """
+    Caches the results of resolving include files, so that they can be
+    shared by every Platform created during a run.
+
+    Include paths are searched using a DirectoryIndex, which may be
+    provided to control how directory listings are invalidated.
+    """
+
+    def __init__(self, index=None):
+        self._found = {}
+        if index is None:
+            index = DirectoryIndex()
+        self.index = index
+
+    def find(self, filename, this_path, include_paths, is_system_include=False):
+        """
+        Determine and return the full path to an include file, named
+        'filename', by searching this_path (for local includes) and
+        then each path in the include_paths tuple.
+        Return None if the file cannot be found.
+        """
+        # this_path is only searched for local includes, so system
+        # includes can share a result regardless of where they appear
+        if is_system_include:
+            this_path = None
+        key = (filename, this_path, include_paths)
+        try:
+            return self._found[key]
+        except KeyError:
+            pass
+
+        local_paths = []
+        if this_path is not None:
+            local_paths += [this_path]
+
+        # Determine the path to the include file, if it exists
+        include_file = None
+        for path in local_paths + list(include_paths):
+            if self.index.isfile(path, filename):
+                include_file = os.path.realpath(os.path.join(path, filename))
+                break
+
+        self._found[key] = include_file
+        return include_file
+
+    def invalidate(self, path):
+        """
+        Forget the listing of the directory at path, and any include
+        files resolved (or not found) by searching it.
+        """
+        self.index.invalidate(path)
+
+        def searched(key):
+            (_, this_path, include_paths) = key
+            search_paths = list(include_paths)
+            if this_path is not None:
+                search_paths.append(this_path)
+            return any(path == p or path.startswith(os.path.join(p, ""))
+                       for p in search_paths)
+
+        self._found = {key: include_file for (key, include_file) in self._found.items()
+                       if not searched(key)}
+
+    def clear(self):
+        """
+        Forget all previously resolved include files, and all directory
+        listings used to resolve them.
+        """
+        self._found.clear()
+        self.index.invalidate()
+
+
 class Platform():
     """
     Represents a platform, and everything associated with a platform.
     Contains a list of definitions, and include paths.
+
+    Include files are resolved using include_cache if provided, which
+    allows results to be shared between Platform instances.
     """
 
-    def __init__(self, name, _root_dir):
+    def __init__(self, name, _root_dir, include_cache=None):
         self._definitions = {}
         self._skip_includes = []
         self._include_paths = []
+        self._include_key = ()
         self._root_dir = _root_dir
         self.name = name
-        self.found_incl = {}
+        if include_cache is None:
+            include_cache = IncludeCache()
+        self._include_cache = include_cache
+        self.recorders = []
 
     def add_include_path(self, path):
         """
@@ -28,11 +299,41 @@ class Platform():
         platform.
         """
         self._include_paths.append(path)
+        self._include_key = tuple(self._include_paths)
+
+    def include_key(self):
+        """
+        Return a hashable value identifying the include paths of this
+        platform.
+        """
+        return self._include_key
+
+    def _signature(self, identifier):
+        """
+        Return the signature of the macro named by 'identifier', or None
+        if it is not defined.
+        """
+        if identifier in self._definitions:
+            return self._definitions[identifier].signature()
+        return None
+
+    def _record_read(self, identifier):
+        """
+        Record a read of the macro named by 'identifier' in all active
+        HeaderSummary recorders.
+        """
+        signature = self._signature(identifier)
+        for summary in self.recorders:
+            summary.read(identifier, signature)
 
     def undefine(self, identifier):
         """
         Undefine a macro for this platform, if it's defined.
         """
+        for summary in self.recorders:
+            summary.written.add(identifier)
+            summary.effects.append(("undefine", identifier))
+
         if identifier in self._definitions:
             del self._definitions[identifier]
 
@@ -41,14 +342,24 @@ class Platform():
         Define a new macro for this platform, only if it's not already
         defined.
         """
+        if self.recorders:
+            self._record_read(identifier)
+
         if identifier not in self._definitions:
             self._definitions[identifier] = macro
+            for summary in self.recorders:
+                summary.written.add(identifier)
+                summary.effects.append(("define", identifier, macro))
 
     def add_include_to_skip(self, fn):
         """
-        Define a new macro for this platform, only if it's not already
-        defined.
+        Add an include file to the list of files to skip, if it is not
+        already in the list.
         """
+        for summary in self.recorders:
+            summary.skip_written.add(fn)
+            summary.effects.append(("skip", fn))
+
         if fn not in self._skip_includes:
             self._skip_includes.append(fn)
 
@@ -57,13 +368,19 @@ class Platform():
         Return a boolean stating if this include file should be
         processed or skipped.
         """
-        return fn not in self._skip_includes
+        skipped = fn in self._skip_includes
+        for summary in self.recorders:
+            summary.read_skip(fn, skipped)
+        return not skipped
 
     def is_defined(self, identifier):
         """
         Return a boolean stating if the macro named by 'identifier' is
         defined.
         """
+        if self.recorders:
+            self._record_read(identifier)
+
         if identifier in self._definitions:
             return "1"
         return "0"
@@ -72,6 +389,9 @@ class Platform():
         """
         Return either a macro definition (if it's defined), or None.
         """
+        if self.recorders:
+            self._record_read(identifier)
+
         if identifier in self._definitions:
             return self._definitions[identifier]
         return None
@@ -84,25 +404,8 @@ class Platform():
         System includes do not include the rootdir, while local includes
         do.
         """
-        try:
-            return self.found_incl[filename]
-        except KeyError:
-            pass
-
-        include_file = None
-
-        local_paths = []
-        if not is_system_include:
-            local_paths += [this_path]
-
-        # Determine the path to the include file, if it exists
-        for path in local_paths + self._include_paths:
-            test_path = os.path.realpath(os.path.join(path, filename))
-            if os.path.isfile(test_path):
-                include_file = test_path
-                self.found_incl[filename] = include_file
-                return include_file
-
-        if include_file is None:
-            self.found_incl[filename] = None
-            return None
+        include_file = self._include_cache.find(filename, this_path, self._include_key,
+                                                is_system_include)
+        for summary in self.recorders:
+            summary.read_include((filename, this_path, is_system_include), include_file)
+        return include_file
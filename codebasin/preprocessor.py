@@ -10,14 +10,14 @@ Contains classes that define:
 
 import logging
 import collections
-import hashlib
-import numpy as np
 import os
+import re
+import sys
 from copy import copy
 import os
 
 from . import util
-from .walkers.tree_associator import TreeAssociator
+from .platform import HeaderSummary
 
 log = logging.getLogger('codebasin')
 
@@ -57,14 +57,38 @@ class MacroExpandOverflow(ValueError):
 class Token():
     """
     Represents a token constructed by the parser.
+    Tokens are stored with __slots__ to reduce their memory footprint.
     """
 
+    __slots__ = ("line", "col", "prev_white", "token")
+
     def __init__(self, line, col, prev_white, token):
         self.line = line
         self.col = col
         self.prev_white = prev_white
         self.token = token
 
+    def __copy__(self):
+        cls = self.__class__
+        result = cls.__new__(cls)
+        result.line = self.line
+        result.col = self.col
+        result.prev_white = self.prev_white
+        result.token = self.token
+        return result
+
+    def with_prev_white(self, prev_white):
+        """
+        Return a token with the same contents as this one and the
+        specified prev_white. This token is returned (without copying)
+        if its prev_white already matches.
+        """
+        if self.prev_white == prev_white:
+            return self
+        result = copy(self)
+        result.prev_white = prev_white
+        return result
+
     def __repr__(self):
         return "Token(line={!r},col={!r},prev_white={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -91,6 +115,8 @@ class CharacterConstant(Token):
     Represents a character constant.
     """
 
+    __slots__ = ()
+
     def __repr__(self):
         return "CharacterConstant(line={!r},col={!r},prev_white={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -103,6 +129,8 @@ class NumericalConstant(Token):
     not be valid syntax).
     """
 
+    __slots__ = ()
+
     def __repr__(self):
         return "NumericalConstant(line={!r},col={!r},prev_white={!r},value={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -113,6 +141,8 @@ class StringConstant(Token):
     Represents a string constant.
     """
 
+    __slots__ = ()
+
     def __repr__(self):
         return "StringConstant(line={!r},col={!r},prev_white={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -149,10 +179,17 @@ class Identifier(Token):
     Represents a C identifier.
     """
 
+    __slots__ = ("expandable",)
+
     def __init__(self, line, col, prev_white, token):
         super().__init__(line, col, prev_white, token)
         self.expandable = True
 
+    def __copy__(self):
+        result = super().__copy__()
+        result.expandable = self.expandable
+        return result
+
     def __repr__(self):
         return "Identifier(line={!r},col={!r},prev_white={!r},expandable={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.expandable, self.token)
@@ -163,6 +200,8 @@ class Operator(Token):
     Represents a C operator.
     """
 
+    __slots__ = ()
+
     def __repr__(self):
         return "Operator(line={!r},col={!r},prev_white={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -173,6 +212,8 @@ class Punctuator(Token):
     Represents a punctuator (e.g. parentheses)
     """
 
+    __slots__ = ()
+
     def __repr__(self):
         return "Punctuator(line={!r},col={!r},prev_white={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -183,6 +224,8 @@ class Unknown(Token):
     Represents an unknown token.
     """
 
+    __slots__ = ()
+
     def __repr__(self):
         return "Unknown(line={!r},col={!r},prev_white={!r},token={!r})".format(
             self.line, self.col, self.prev_white, self.token)
@@ -191,13 +234,45 @@ class Unknown(Token):
 class Lexer:
     """
     A lexer for the C preprocessor grammar.
-    """
 
-    def __init__(self, string, line="Unknown"):
+    By default, strings are tokenized using a single regular expression.
+    If reference is True (or the string contains non-ASCII characters),
+    the original character-by-character lexer is used instead.
+    """
+
+    # Each alternative matches the same text as the corresponding method
+    # of the reference lexer, and alternatives are tried in the same order.
+    _operators = ["||", "&&", ">>", "<<", "!=", ">=", "<=", "==", "##",
+                  "-", "+", "!", "*", "/", "|", "&", "^", "<", ">", "?", ":", "~", "#", "=", "%"]
+    _punctuators = ["(", ")", "{", "}", "[", "]", ",", ".", ";", "'", "\"", "\\"]
+    _token_re = re.compile("|".join([
+        r"(?P<whitespace>[ \t\n\r]+)",
+        r"(?P<number>\.?[0-9](?:[eEpP][+-]|[A-Za-z0-9_.])*)",
+        r"'(?P<character>\\[ -~]|[ -\[\]-~])'",
+        r'"(?P<string>(?:\\"|\\(?!")|[^"\\])*)"',
+        r"(?P<identifier>[A-Za-z_][A-Za-z0-9_]*)",
+        "(?P<operator>" + "|".join(re.escape(op) for op in _operators) + ")",
+        "(?P<punctuator>" + "|".join(re.escape(p) for p in _punctuators) + ")",
+        r"(?P<unknown>.)"]), re.DOTALL)
+    _non_ascii = re.compile(r"[^\x00-\x7f]")
+    _token_classes = {"number": NumericalConstant,
+                      "character": CharacterConstant,
+                      "string": StringConstant,
+                      "identifier": Identifier,
+                      "operator": Operator,
+                      "punctuator": Punctuator,
+                      "unknown": Unknown}
+
+    # Spellings that are likely to repeat are interned, so that retained
+    # token lists share a single copy of each spelling.
+    _interned = frozenset(["identifier", "operator", "punctuator"])
+
+    def __init__(self, string, line="Unknown", reference=False):
         self.string = string
         self.line = line
         self.pos = 0
         self.prev_white = False
+        self.reference = reference
 
     def read(self, n=1):
         """
@@ -448,6 +523,34 @@ class Lexer:
         """
         Return a list of all tokens in the string.
         """
+        if self.reference or Lexer._non_ascii.search(self.string):
+            return self._tokenize_reference()
+
+        tokens = []
+        line = self.line
+        prev_white = self.prev_white
+        token_classes = self._token_classes
+        interned = self._interned
+        for m in self._token_re.finditer(self.string, self.pos):
+            kind = m.lastgroup
+            if kind == "whitespace":
+                prev_white = True
+                continue
+            spelling = m.group(kind)
+            if kind in interned:
+                spelling = sys.intern(spelling)
+            tokens.append(token_classes[kind](line, m.start(), prev_white, spelling))
+            prev_white = False
+
+        self.pos = len(self.string)
+        self.prev_white = prev_white
+        return tokens
+
+    def _tokenize_reference(self):
+        """
+        Return a list of all tokens in the string, using the reference
+        implementation.
+        """
         tokens = []
         self.whitespace()
         while not self.eos():
@@ -482,6 +585,8 @@ class Node():
     Contains a single parent, and an ordered list of children.
     """
 
+    __slots__ = ("children", "parent")
+
     def __init__(self):
         self.children = []
         self.parent = None
@@ -536,6 +641,8 @@ class FileNode(Node):
     inheriting from the Node class.
     """
 
+    __slots__ = ("filename", "num_lines", "total_sloc", "file_hash")
+
     def __init__(self, _filename):
         super().__init__()
         self.filename = _filename
@@ -543,16 +650,7 @@ class FileNode(Node):
         self.num_lines = 0
         # The source lines of code, ignoring blank lines and comments
         self.total_sloc = 0
-        self.file_hash = self.__compute_file_hash()
-
-    def __compute_file_hash(self):
-        chunk_size = 4096
-        hasher = hashlib.sha512()
-        with util.safe_open_read_nofollow(self.filename, 'rb') as in_file:
-            for chunk in iter(lambda: in_file.read(chunk_size), b""):
-                hasher.update(chunk)
-
-        return hasher.hexdigest()
+        self.file_hash = util.compute_file_hash(self.filename)
 
     def to_json(self, assoc):
         parent_json = super().to_json(assoc)
@@ -584,6 +682,8 @@ class CodeNode(Node):
     the original source.
     """
 
+    __slots__ = ("start_line", "end_line", "num_lines", "source")
+
     def __init__(self, start_line=-1, end_line=-1, num_lines=0, source=None):
         super().__init__()
         self.start_line = start_line
@@ -635,6 +735,8 @@ class DirectiveNode(CodeNode):
     countable lines and extent.
     """
 
+    __slots__ = ("kind",)
+
     def __init__(self):
         super().__init__()
 
@@ -651,6 +753,8 @@ class UnrecognizedDirectiveNode(DirectiveNode):
     A CodeNode representing an unrecognized preprocessor directive
     """
 
+    __slots__ = ("tokens",)
+
     def __init__(self, tokens):
         super().__init__()
         self.kind = "unrecognized"
@@ -672,6 +776,8 @@ class PragmaNode(DirectiveNode):
     Represents a #pragma directive
     """
 
+    __slots__ = ("tokens",)
+
     def __init__(self, tokens):
         super().__init__()
         self.kind = "pragma"
@@ -697,6 +803,8 @@ class DefineNode(DirectiveNode):
     A DirectiveNode representing a #define directive.
     """
 
+    __slots__ = ("identifier", "args", "value")
+
     def __init__(self, identifier, args=None, value=None):
         super().__init__()
         self.kind = "define"
@@ -737,6 +845,8 @@ class UndefNode(DirectiveNode):
     A DirectiveNode representing an #undef directive.
     """
 
+    __slots__ = ("identifier",)
+
     def __init__(self, identifier):
         super().__init__()
         self.kind = "undefine"
@@ -794,6 +904,8 @@ class IncludeNode(DirectiveNode):
     Its value is an IncludePath or a list of tokens.
     """
 
+    __slots__ = ("value",)
+
     def __init__(self, value):
         super().__init__()
         self.kind = "include"
@@ -839,10 +951,78 @@ class IncludeNode(DirectiveNode):
 
         if include_file and kwargs['platform'].process_include(include_file):
             kwargs['state'].insert_file(include_file)
+            kwargs['state'].associate_header(include_file, kwargs['platform'])
 
-            associator = TreeAssociator(kwargs['state'].get_tree(
-                include_file), kwargs['state'].get_map(include_file))
-            associator.walk(kwargs['platform'], kwargs['state'])
+
+class CompiledCondition():
+    """
+    Represents the expression of an #if or #elif directive, prepared
+    for repeated evaluation.
+
+    Tests of the form defined(X) or !defined(X) are answered directly by
+    the platform. Other expressions are expanded and evaluated, and each
+    result is memoized against the signatures of the macros that were
+    read, so that it can be reused by any platform that agrees on them.
+    """
+
+    __slots__ = ("tokens", "identifier", "negated", "results")
+
+    # Maximum number of results memoized for each set of dependencies
+    max_results = 64
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.identifier = None
+        self.negated = False
+        self.results = {}
+
+        body = tokens
+        negated = False
+        if body and isinstance(body[0], Operator) and body[0].token == "!":
+            (body, negated) = (body[1:], True)
+        spelling = [t.token for t in body]
+        operand = None
+        if len(body) == 4 and spelling[:2] == ["defined", "("] and spelling[3] == ")":
+            operand = body[2]
+        elif len(body) == 2 and spelling[0] == "defined":
+            operand = body[1]
+        if isinstance(operand, Identifier) and isinstance(body[0], Identifier):
+            self.identifier = operand.token
+            self.negated = negated
+
+    def evaluate(self, platform):
+        """
+        Evaluate the expression for the specified platform.
+        Return True/False or raises an exception if the expression is
+        not recognized.
+        """
+        if self.identifier is not None:
+            return (platform.is_defined(self.identifier) == "1") != self.negated
+
+        for (identifiers, results) in self.results.items():
+            signatures = tuple(platform._signature(identifier) for identifier in identifiers)
+            if signatures in results:
+                # Re-issue the reads, so that recorders see the same
+                # dependencies as they would during an evaluation.
+                if platform.recorders:
+                    for identifier in identifiers:
+                        platform.get_macro(identifier)
+                return results[signatures]
+
+        recorder = HeaderSummary()
+        platform.recorders.append(recorder)
+        try:
+            expanded_tokens = MacroExpander(platform).expand(self.tokens)
+            result = ExpressionEvaluator(expanded_tokens).evaluate()
+        finally:
+            platform.recorders.pop()
+
+        identifiers = tuple(recorder.reads)
+        results = self.results.setdefault(identifiers, {})
+        if len(results) >= self.max_results:
+            results.clear()
+        results[tuple(recorder.reads.values())] = result
+        return result
 
 
 class IfNode(DirectiveNode):
@@ -850,10 +1030,13 @@ class IfNode(DirectiveNode):
     Represents an #if, #ifdef or #ifndef directive.
     """
 
+    __slots__ = ("tokens", "condition")
+
     def __init__(self, tokens):
         super().__init__()
         self.kind = "if"
         self.tokens = tokens
+        self.condition = None
 
     @staticmethod
     def is_start_node():
@@ -870,11 +1053,10 @@ class IfNode(DirectiveNode):
         return ["#if {0!s}".format(" ".join([str(t) for t in self.tokens]))]
 
     def evaluate_for_platform(self, **kwargs):
-        # Perform macro substitution with tokens
-        expanded_tokens = MacroExpander(kwargs['platform']).expand(self.tokens)
-
-        # Evaluate the expanded tokens
-        return ExpressionEvaluator(expanded_tokens).evaluate()
+        # Compile the expression on first use
+        if self.condition is None:
+            self.condition = CompiledCondition(self.tokens)
+        return self.condition.evaluate(kwargs['platform'])
 
 
 class ElIfNode(IfNode):
@@ -882,6 +1064,8 @@ class ElIfNode(IfNode):
     Represents an #elif directive.
     """
 
+    __slots__ = ()
+
     def __init__(self, tokens):
         super().__init__(tokens)
         self.kind = "elif"
@@ -900,6 +1084,8 @@ class ElseNode(DirectiveNode):
     Represents an #else directive.
     """
 
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.kind = "else"
@@ -927,6 +1113,8 @@ class EndIfNode(DirectiveNode):
     Represents an #endif directive.
     """
 
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
         self.kind = "endif"
@@ -1398,6 +1586,7 @@ class Macro:
     def __init__(self, name, replacement):
         self.name = name.token
         self.replacement = replacement
+        self._signature = None
 
         if isinstance(self.replacement, list) and len(self.replacement) > 0:
             if self.replacement[0].token == "##":
@@ -1475,6 +1664,18 @@ class Macro:
         """
         return self.replacement
 
+    def _replacement_signature(self):
+        return tuple((type(t).__name__, t.token, t.prev_white) for t in self.replacement)
+
+    def signature(self):
+        """
+        Return a hashable value that is equal for Macros that expand in
+        the same way.
+        """
+        if self._signature is None:
+            self._signature = ("macro", self.name, self._replacement_signature())
+        return self._signature
+
 
 class MacroFunction(Macro):
     """
@@ -1520,6 +1721,16 @@ class MacroFunction(Macro):
         arg_str = ",".join([str(t) for t in self.args])
         return ["{0!s}({1!s})={2!s}".format(self.name, arg_str, replacement_str)]
 
+    def signature(self):
+        """
+        Return a hashable value that is equal for MacroFunctions that
+        expand in the same way.
+        """
+        if self._signature is None:
+            self._signature = ("function", self.name, tuple(self.args), self.variadic,
+                               self._replacement_signature())
+        return self._signature
+
     def replace(self, input_args):
         """
         Return the substituted replacement for this macro.
@@ -1575,10 +1786,7 @@ class MacroFunction(Macro):
                                 f"Concatenation didn't result in valid token {lex.string}")
                         tok.prev_white = last[-1].prev_white
                         toadd = last[:-1] + [tok] + nexttok[1:]
-                        if toadd[0].prev_white != prev_white:
-                            cp = copy(toadd[0])
-                            cp.prev_white = prev_white
-                            toadd[0].prev_white = prev_white
+                        toadd[0] = toadd[0].with_prev_white(prev_white)
                         res_tokens.extend(toadd)
                     else:
                         res_tokens.extend(nexttok)
@@ -1614,8 +1822,7 @@ class MacroFunction(Macro):
             try:
                 substitution = input_args[self.args.index(token.token)][1]
                 if len(substitution) > 0:
-                    substitution[0] = copy(substitution[0])
-                    substitution[0].prev_white = token.prev_white
+                    substitution[0] = substitution[0].with_prev_white(token.prev_white)
             except (ValueError, ParseError):
                 substitution = [token]
 
@@ -1880,14 +2087,12 @@ class MacroExpander:
                     # Proper expand
                     replacement = macro_lookup.replace(pre_expanded)
                     if isinstance(replacement, list) and len(replacement) > 0:
-                        replacement[0] = copy(replacement[0])
-                        replacement[0].prev_white = ctok.prev_white
+                        replacement[0] = replacement[0].with_prev_white(ctok.prev_white)
                     self.push(replacement, macro_lookup.name)
                 elif type(macro_lookup) == Macro:
                     replacement = macro_lookup.replace()
                     if isinstance(replacement, list) and len(replacement) > 0:
-                        replacement[0] = copy(replacement[0])
-                        replacement[0].prev_white = ctok.prev_white
+                        replacement[0] = replacement[0].with_prev_white(ctok.prev_white)
                     self.push(replacement, macro_lookup.name)
                 else:
                     raise ParseError("Unexpected error in macro expansion")
@@ -1901,9 +2106,40 @@ class MacroExpander:
             return [NumericalConstant("EXPANSION", -1, False, "0")]
 
 
+class UnsignedInteger(int):
+    """
+    Represents a value of unsigned 64-bit type in a preprocessor
+    expression. Values of signed type are represented by plain ints.
+    """
+
+    __slots__ = ()
+
+
+# Preprocessor always uses 64-bit arithmetic!
+_UINT_MAX = (1 << 64) - 1
+_INT_MAX = (1 << 63) - 1
+
+
+def _wrap(value, unsigned):
+    """
+    Return value converted to a 64-bit signed or unsigned integer, with
+    two's complement wrap-around.
+    """
+    value &= _UINT_MAX
+    if unsigned:
+        return UnsignedInteger(value)
+    if value > _INT_MAX:
+        value -= 1 << 64
+    return value
+
+
 class ExpressionEvaluator(Parser):
     """
     A specialized token parser for recognizing/evaluating expressions.
+
+    Values are Python ints, masked to 64 bits after every operation.
+    Operands are converted to unsigned if either has unsigned type, as
+    in C.
     """
 
     # Operator precedence, associativity and Python equivalent
@@ -1956,7 +2192,7 @@ class ExpressionEvaluator(Parser):
 
             # Any function call that still exists after substitution
             # evaluates to false
-            return np.int64(0)
+            return 0
         except ParseError:
             self.pos = initial_pos
             raise ParseError("Invalid function call.")
@@ -1999,9 +2235,12 @@ class ExpressionEvaluator(Parser):
             # Preprocessor always uses 64-bit arithmetic!
             int_value = int(value, base)
             if suffix and 'u' in suffix:
-                return np.uint64(int_value)
-            else:
-                return np.int64(int_value)
+                if int_value > _UINT_MAX:
+                    raise OverflowError("Integer constant too large for 64-bit unsigned type.")
+                return UnsignedInteger(int_value)
+            if int_value > _INT_MAX:
+                raise OverflowError("Integer constant too large for 64-bit signed type.")
+            return int_value
         except ParseError:
             self.pos = initial_pos
 
@@ -2009,7 +2248,7 @@ class ExpressionEvaluator(Parser):
         # Convert from character literals to integer value.
         try:
             constant = self.match_type(CharacterConstant)
-            return np.int64(ord(constant.token))
+            return ord(constant.token)
         except ParseError:
             self.pos = initial_pos
 
@@ -2024,7 +2263,7 @@ class ExpressionEvaluator(Parser):
         # to false
         try:
             self.match_type(Identifier)
-            return np.int64(0)
+            return 0
         except ParseError:
             self.pos = initial_pos
 
@@ -2111,6 +2350,9 @@ class ExpressionEvaluator(Parser):
                 condition = expr
                 false_result = rhs
                 expr = true_result if condition else false_result
+                if isinstance(true_result, UnsignedInteger) or isinstance(false_result,
+                                                                           UnsignedInteger):
+                    expr = _wrap(expr, True)
             else:
                 expr = self.__apply_binary_op(operator.token, expr, rhs)
 
@@ -2140,14 +2382,15 @@ class ExpressionEvaluator(Parser):
         """
         Apply the specified unary operator: op operand
         """
+        unsigned = isinstance(operand, UnsignedInteger)
         if op == '-':
-            return -operand
+            return _wrap(-operand, unsigned)
         elif op == '+':
-            return +operand
+            return operand
         elif op == '!':
-            return not operand
+            return int(not operand)
         elif op == '~':
-            return ~operand
+            return _wrap(~operand, unsigned)
         else:
             raise ValueError("Not a valid unary operator.")
 
@@ -2158,41 +2401,63 @@ class ExpressionEvaluator(Parser):
         Apply the specified binary operator: lhs op rhs
         """
         if op == '||':
-            return lhs or rhs
+            return int(bool(lhs or rhs))
         elif op == '&&':
-            return lhs and rhs
-        elif op == '|':
-            return lhs | rhs
+            return int(bool(lhs and rhs))
+
+        # The result of a shift has the type of its left operand.
+        # Shifting by a negative count or by at least the width of the
+        # type is undefined in C, so it is treated as shifting out all
+        # of the bits.
+        if op in ('<<', '>>'):
+            unsigned = isinstance(lhs, UnsignedInteger)
+            if not 0 <= rhs < 64:
+                return _wrap(-1 if op == '>>' and lhs < 0 else 0, unsigned)
+            if op == '<<':
+                return _wrap(lhs << rhs, unsigned)
+            return _wrap(lhs >> rhs, unsigned)
+
+        unsigned = isinstance(lhs, UnsignedInteger) or isinstance(rhs, UnsignedInteger)
+        if unsigned:
+            lhs &= _UINT_MAX
+            rhs &= _UINT_MAX
+
+        if op == '|':
+            return _wrap(lhs | rhs, unsigned)
         elif op == '^':
-            return lhs ^ rhs
+            return _wrap(lhs ^ rhs, unsigned)
         elif op == '&':
-            return lhs & rhs
+            return _wrap(lhs & rhs, unsigned)
         elif op == '==':
-            return lhs == rhs
+            return int(lhs == rhs)
         elif op == '!=':
-            return lhs != rhs
+            return int(lhs != rhs)
         elif op == '<':
-            return lhs < rhs
+            return int(lhs < rhs)
         elif op == '<=':
-            return lhs <= rhs
+            return int(lhs <= rhs)
         elif op == '>':
-            return lhs > rhs
+            return int(lhs > rhs)
         elif op == '>=':
-            return lhs >= rhs
-        elif op == '<<':
-            return lhs << rhs
-        elif op == '>>':
-            return lhs >> rhs
+            return int(lhs >= rhs)
         elif op == '+':
-            return lhs + rhs
+            return _wrap(lhs + rhs, unsigned)
         elif op == '-':
-            return lhs - rhs
+            return _wrap(lhs - rhs, unsigned)
         elif op == '*':
-            return lhs * rhs
-        elif op == '/':
-            return lhs // rhs  # force integer division
-        elif op == '%':
-            return lhs % rhs
+            return _wrap(lhs * rhs, unsigned)
+        elif op in ('/', '%'):
+            # Division by zero evaluates to zero
+            if rhs == 0:
+                return _wrap(0, unsigned)
+
+            # Division truncates towards zero
+            quotient = abs(lhs) // abs(rhs)
+            if (lhs < 0) != (rhs < 0):
+                quotient = -quotient
+            if op == '/':
+                return _wrap(quotient, unsigned)
+            return _wrap(lhs - quotient * rhs, unsigned)
         else:
             raise ValueError("Not a binary operator.")
 
@@ -2221,6 +2486,24 @@ class SourceTree():
     def associate_file(self, filename):
         self.root.filename = filename
 
+    def iter_nodes(self):
+        """
+        Yield all nodes in the tree, in depth-first pre-order.
+        """
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            yield node
+            stack.extend(reversed(node.children))
+
+    def nodes(self):
+        """
+        Return a list of all nodes in the tree, in depth-first
+        pre-order. A node's position in this list identifies it across
+        copies of the same tree.
+        """
+        return list(self.iter_nodes())
+
     def walk_to_tree_insertion_point(self):
         """
         This function modifies self._latest_node to be a node that can
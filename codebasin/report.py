@@ -4,24 +4,217 @@
 Contains functions for generating command-line reports.
 """
 
+import collections
 import itertools as it
 import json
 import logging
 
 from . import util
+from .preprocessor import CodeNode, DirectiveNode
+from .codebase import CodeBaseIndex
 
 log = logging.getLogger("codebasin")
 
+# Values of node_kind in a binary dump
+_FILE_NODE = 0
+_CODE_NODE = 1
+_DIRECTIVE_NODE = 2
+
 
 def annotated_dump(output_file, state):
-    outlist = []
-    for fname in state.get_filenames():
-        source_tree = state.get_tree(fname)
-        node_associations = state.get_map(fname)
-        outlist.append(source_tree.root.to_json(node_associations))
+    """
+    Write the annotated tree of each file to output_file.
 
+    Trees are converted and written one file at a time, so that memory
+    use is bounded by the size of the largest tree. If output_file has
+    a .jsonl extension, each tree is written as a single line (JSON
+    Lines). Otherwise, the output is a JSON list indented by two spaces.
+    """
     with open(output_file, 'w') as fp:
-        fp.write(json.dumps(outlist, indent=2))
+        if util.ensure_jsonl(output_file):
+            for fname in state.get_filenames():
+                source_tree = state.get_tree(fname)
+                node_associations = state.get_map(fname)
+                fp.write(json.dumps(source_tree.root.to_json(node_associations)))
+                fp.write("\n")
+            return
+
+        # Equivalent to json.dump(outlist, fp, indent=2), with each
+        # element of the list encoded separately.
+        encoder = json.JSONEncoder(indent=2)
+        separator = "[\n  "
+        for fname in state.get_filenames():
+            source_tree = state.get_tree(fname)
+            node_associations = state.get_map(fname)
+            fp.write(separator)
+            for chunk in encoder.iterencode(source_tree.root.to_json(node_associations)):
+                fp.write(chunk.replace("\n", "\n  "))
+            separator = ",\n  "
+
+        if separator == "[\n  ":
+            fp.write("[]")
+        else:
+            fp.write("\n]")
+
+
+def binary_dump(output_file, state, codebase=None):
+    """
+    Write the annotated trees in state to output_file in a compact,
+    columnar NumPy (.npz) format.
+
+    The nodes of all files are stored in pre-order, one column per
+    attribute, and the platforms associated with each node are stored
+    as a row of packed bits, with bit i representing the i-th entry of
+    the platform list. If a codebase is provided, files outside of the
+    codebase are marked so that they are excluded when the setmap is
+    rebuilt.
+
+    Directive spellings and source lines are not stored; use
+    annotated_dump for those.
+    """
+    import numpy as np
+
+    platforms = list(state.platforms)
+    nbytes = max(1, (len(platforms) + 7) // 8)
+
+    files = []
+    hashes = []
+    included = []
+    offsets = [0]
+    columns = {"kind": [], "start_line": [], "end_line": [], "num_lines": [], "parent": []}
+    masks = bytearray()
+    codebase_index = None if codebase is None else CodeBaseIndex.from_codebase(codebase)
+    for fn in state.get_filenames():
+        tree = state.get_tree(fn)
+        node_masks = state.get_masks(fn)
+
+        files.append(tree.root.filename)
+        hashes.append(tree.root.file_hash)
+        included.append(codebase_index is None or not codebase_index.excludes(tree.root.filename))
+
+        # Parents are stored as pre-order indices within the file
+        stack = [(tree.root, -1)]
+        index = 0
+        while stack:
+            (node, parent) = stack.pop()
+            if isinstance(node, DirectiveNode):
+                columns["kind"].append(_DIRECTIVE_NODE)
+            elif isinstance(node, CodeNode):
+                columns["kind"].append(_CODE_NODE)
+            else:
+                columns["kind"].append(_FILE_NODE)
+            columns["start_line"].append(getattr(node, "start_line", -1))
+            columns["end_line"].append(getattr(node, "end_line", -1))
+            columns["num_lines"].append(node.num_lines)
+            columns["parent"].append(parent)
+            masks += node_masks.get(node, 0).to_bytes(nbytes, "little")
+            stack.extend((child, index) for child in reversed(node.children))
+            index += 1
+        offsets.append(offsets[-1] + index)
+
+    def concatenate(column, dtype):
+        return np.array(column, dtype=dtype)
+
+    with util.safe_open_write_binary(output_file) as fp:
+        np.savez_compressed(fp,
+                            format_version=np.array(1),
+                            platforms=np.array(platforms, dtype=np.str_),
+                            files=np.array(files, dtype=np.str_),
+                            file_hashes=np.array(hashes, dtype=np.str_),
+                            file_included=np.array(included, dtype=bool),
+                            node_offsets=np.array(offsets, dtype=np.int64),
+                            node_kind=concatenate(columns["kind"], np.int8),
+                            node_start_line=concatenate(columns["start_line"], np.int64),
+                            node_end_line=concatenate(columns["end_line"], np.int64),
+                            node_num_lines=concatenate(columns["num_lines"], np.int64),
+                            node_parent=concatenate(columns["parent"], np.int64),
+                            node_platforms=np.frombuffer(bytes(masks), dtype=np.uint8)
+                            .reshape(-1, nbytes))
+
+
+class BinaryDump():
+    """
+    Loads a dump written by binary_dump, and answers queries about it
+    without re-parsing any source files.
+    """
+
+    def __init__(self, input_file):
+        import numpy as np
+
+        with np.load(input_file, allow_pickle=False) as data:
+            if int(data["format_version"]) != 1:
+                raise ValueError(f"{input_file} has an unsupported format version.")
+            self.platforms = data["platforms"].tolist()
+            self.files = data["files"].tolist()
+            self.file_hashes = data["file_hashes"].tolist()
+            self.file_included = data["file_included"]
+            self.node_offsets = data["node_offsets"]
+            self.node_kind = data["node_kind"]
+            self.node_start_line = data["node_start_line"]
+            self.node_end_line = data["node_end_line"]
+            self.node_num_lines = data["node_num_lines"]
+            self.node_parent = data["node_parent"]
+            self.node_platforms = data["node_platforms"]
+
+    def _counted_nodes(self):
+        """
+        Return a boolean array selecting the code and directive nodes of
+        files in the codebase.
+        """
+        import numpy as np
+
+        included = np.repeat(self.file_included, np.diff(self.node_offsets))
+        return included & (self.node_kind != _FILE_NODE)
+
+    def platform_set(self, row):
+        """
+        Return the frozenset of platform names represented by a row of
+        packed bits.
+        """
+        import numpy as np
+
+        bits = np.unpackbits(row, bitorder="little")[:len(self.platforms)]
+        return frozenset(p for (p, bit) in zip(self.platforms, bits) if bit)
+
+    def setmap(self):
+        """
+        Rebuild the mapping of platform sets to lines of code.
+        """
+        setmap = collections.defaultdict(int)
+        counted = self._counted_nodes()
+        if not counted.any():
+            return setmap
+
+        import numpy as np
+
+        rows = self.node_platforms[counted]
+        unique, inverse = np.unique(rows, axis=0, return_inverse=True)
+        counts = np.bincount(inverse.reshape(-1), weights=self.node_num_lines[counted],
+                             minlength=len(unique))
+        for (row, count) in zip(unique, counts.tolist()):
+            setmap[self.platform_set(row)] += int(count)
+        return setmap
+
+    def coverage(self, platform):
+        """
+        Return a dict mapping each file in the codebase to a list of
+        (start_line, end_line, num_lines) regions used by the platform.
+        """
+        import numpy as np
+
+        i = self.platforms.index(platform)
+        used = ((self.node_platforms[:, i // 8] >> (i % 8)) & 1).astype(bool)
+        used &= self._counted_nodes()
+
+        coverage = {}
+        for (f, fn) in enumerate(self.files):
+            (start, end) = self.node_offsets[f], self.node_offsets[f + 1]
+            indices = np.flatnonzero(used[start:end]) + start
+            if len(indices):
+                coverage[fn] = list(zip(self.node_start_line[indices].tolist(),
+                                        self.node_end_line[indices].tolist(),
+                                        self.node_num_lines[indices].tolist()))
+        return coverage
 
 
 def extract_platforms(setmap):
@@ -74,22 +267,53 @@ def distance(setmap, p1, p2):
     return d
 
 
+def distance_matrix(setmap, platforms):
+    """
+    Compute the distance between every pair of platforms in a single
+    pass, returning a NumPy array indexed by position in platforms.
+
+    The setmap is converted to a (platform sets x platforms) membership
+    matrix M and a vector of line counts w, from which the lines shared
+    by each pair of platforms are G = M^T diag(w) M. The distance between
+    platforms i and j is then (G_ii + G_jj - 2 G_ij) / (G_ii + G_jj - G_ij).
+    """
+    import numpy as np
+
+    index = {p: i for (i, p) in enumerate(platforms)}
+    psets = list(setmap.keys())
+    membership = np.zeros((len(psets), len(platforms)))
+    for (row, pset) in enumerate(psets):
+        for p in pset:
+            membership[row, index[p]] = 1
+    weights = np.array([setmap[pset] for pset in psets], dtype=float)
+
+    shared = membership.T @ (membership * weights[:, np.newaxis])
+    totals = np.diag(shared)
+    union = totals[:, np.newaxis] + totals[np.newaxis, :] - shared
+    matrix = np.zeros_like(union)
+    np.divide(union - shared, union, out=matrix, where=union > 0)
+    return matrix
+
+
+def _average_distance(matrix):
+    """
+    Return the average of the pair-wise distances in a distance matrix.
+    """
+    import numpy as np
+
+    n = matrix.shape[0]
+    if n < 2:
+        return 0
+    return float(matrix[np.triu_indices(n, 1)].mean())
+
+
 def divergence(setmap):
     """
     Compute code divergence as defined by Harrell and Kitson
     i.e. average of pair-wise distances between platform sets
     """
     platforms = extract_platforms(setmap)
-
-    d = 0
-    npairs = 0
-    for (p1, p2) in it.combinations(platforms, 2):
-        d += distance(setmap, p1, p2)
-        npairs += 1
-
-    if npairs == 0:
-        return 0
-    return d / float(npairs)
+    return _average_distance(distance_matrix(setmap, platforms))
 
 
 def summary(setmap):
@@ -146,7 +370,8 @@ def clustering(output_name, setmap):
     from scipy.spatial.distance import squareform
 
     # Compute distance matrix between platforms
-    matrix = [[distance(setmap, p1, p2) for p2 in platforms] for p1 in platforms]
+    matrix = distance_matrix(setmap, platforms)
+    average = _average_distance(matrix)
 
     # Print distance matrix as a table
     lines = []
@@ -162,8 +387,8 @@ def clustering(output_name, setmap):
     fig, ax = plt.subplots()
     hierarchy.dendrogram(clusters, labels=platforms, orientation="right")
     ax.set_xlim(xmin=0, xmax=1)
-    ax.axvline(x=divergence(setmap), linestyle='--', label="Average")
-    plt.text(divergence(setmap), ax.get_ylim()[1], "Average", ha="center", va="bottom")
+    ax.axvline(x=average, linestyle='--', label="Average")
+    plt.text(average, ax.get_ylim()[1], "Average", ha="center", va="bottom")
     plt.xlabel("Code Divergence")
     with util.safe_open_write_binary(output_name) as fp:
         fig.savefig(fp)
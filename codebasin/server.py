@@ -0,0 +1,397 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Contains classes and functions for keeping the analysis of a code base
+resident in a long-running process, and answering JSON-RPC queries about
+it over a stream (e.g. stdin/stdout) or a Unix domain socket.
+"""
+
+import json
+import logging
+import os
+import time
+
+from . import cache
+from . import config
+from . import finder
+from . import incremental
+from . import platform
+from . import util
+from .preprocessor import CodeNode
+from .walkers.platform_mapper import PlatformMapper
+
+log = logging.getLogger("codebasin")
+
+# JSON-RPC 2.0 error codes
+PARSE_ERROR = -32700
+INVALID_REQUEST = -32600
+METHOD_NOT_FOUND = -32601
+INVALID_PARAMS = -32602
+INTERNAL_ERROR = -32603
+
+
+class InvalidParams(ValueError):
+    """
+    Raised by a query method when it is called with invalid parameters.
+    """
+
+
+# A fingerprint that never matches that of a path
+_UNKNOWN = (-1, -1)
+
+# The coarsest modification time resolution expected of a file system,
+# in nanoseconds
+_MTIME_RESOLUTION = 2 * 10**9
+
+
+def _fingerprint(path):
+    """
+    Return the (modification time, size) of a path, or None if it does
+    not exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+class AnalysisServer():
+    """
+    Keeps the configuration, parsed trees, include resolutions and
+    platform associations of a code base resident, and answers queries
+    about them.
+
+    Before answering a query, the server checks (at most once per
+    interval seconds) whether any file it analyzed, the configuration
+    or any directory those files live in has changed. If so, only the
+    changed files are parsed again, and compilation commands whose
+    inputs are unchanged are replayed from an in-memory AnalysisHistory.
+
+    A changed directory may change how globs and #include directives
+    resolve. The globs in the configuration are expanded again, and if
+    the code base and compilation commands are unchanged (e.g. because
+    an editor wrote a swap file) only include files searched for in
+    that directory are resolved again. Otherwise, every compilation
+    command is associated again.
+
+    Fingerprints describe the state of each input before it was read,
+    so a change made while an analysis is running is found by the next
+    check.
+    """
+
+    def __init__(self, config_file, rootdir, *, parse_cache=None, interval=1.0):
+        self.config_file = os.path.realpath(config_file)
+        self.rootdir = os.path.realpath(rootdir)
+        self.interval = interval
+        self.trees = cache.MemoryParseCache(parse_cache)
+        self.include_cache = platform.IncludeCache(platform.RevalidatingDirectoryIndex())
+        self.history = incremental.AnalysisHistory(None)
+        self.codebase = None
+        self.configuration = None
+        self.state = None
+        self.setmap = None
+        self.stopped = False
+        self._config_files = {}
+        self._files = {}
+        self._directories = {}
+        self._checked = None
+        self.refresh(force=True)
+
+    def _config_inputs(self):
+        """
+        Return the configuration file and any compilation databases that
+        it refers to.
+        """
+        import yaml
+
+        inputs = [self.config_file]
+        with util.safe_open_read_nofollow(self.config_file, "r") as f:
+            cfg = yaml.safe_load(f) or {}
+        for (name, section) in cfg.items():
+            if name != "codebase" and isinstance(section, dict) and "commands" in section:
+                inputs.append(os.path.realpath(os.path.join(self.rootdir,
+                                                            section["commands"])))
+        return inputs
+
+    def _watch(self, state, codebase, configuration, directories, started):
+        """
+        Return the fingerprints of the source files and directories used
+        by an analysis, as a (files, directories) tuple of dicts.
+
+        Source files take the fingerprint that their tree was built from.
+        directories holds fingerprints taken before the analysis started.
+        Directories are watched if they contain a source file, or are
+        searched for include files.
+
+        Any other path is fingerprinted now. If it may have been
+        modified after the analysis started (at time started), it may
+        have been read in an earlier state, so it is recorded as unknown
+        and treated as changed by the next check.
+        """
+        def fingerprint_now(path):
+            fingerprint = _fingerprint(path)
+            if fingerprint is not None and fingerprint[0] >= started - _MTIME_RESOLUTION:
+                return _UNKNOWN
+            return fingerprint
+
+        files = {}
+        for fn in state.get_filenames():
+            fingerprint = self.trees.fingerprint(fn, state.summarize_only)
+            files[fn] = fingerprint if fingerprint is not None else fingerprint_now(fn)
+        for fn in codebase["files"]:
+            if fn not in files:
+                files[fn] = fingerprint_now(fn)
+
+        paths = {self.rootdir}
+        paths.update(os.path.dirname(fn) for fn in files)
+        for p in configuration:
+            for e in configuration[p]:
+                paths.update(e["include_paths"])
+        directories = {path: directories[path] if path in directories else fingerprint_now(path)
+                       for path in paths}
+        return (files, directories)
+
+    def refresh(self, force=False):
+        """
+        Bring the analysis up to date with the files on disk.
+        Return a sorted list of the paths found to have changed.
+        """
+        now = time.monotonic()
+        if not force and self._checked is not None and now - self._checked < self.interval:
+            return []
+
+        changed_config = [path for (path, fp) in self._config_files.items()
+                          if _fingerprint(path) != fp]
+        changed_files = [path for (path, fp) in self._files.items()
+                         if _fingerprint(path) != fp]
+        directories = {path: _fingerprint(path) for path in self._directories}
+        changed_directories = [path for (path, fp) in self._directories.items()
+                               if directories[path] != fp]
+        changed = sorted(set(changed_config + changed_files + changed_directories))
+        if not (force or changed):
+            self._checked = now
+            return []
+
+        # Fingerprint the inputs before they are read
+        started = int(time.time() * 10**9)
+        config_files = {path: _fingerprint(path) for path in self._config_inputs()}
+        directories[self.rootdir] = _fingerprint(self.rootdir)
+
+        # Globs and #include directives may now resolve differently
+        if force or changed_config or changed_directories:
+            log.info("Reloading configuration %s", self.config_file)
+            (codebase, configuration) = config.load(self.config_file, self.rootdir)
+        else:
+            (codebase, configuration) = (self.codebase, self.configuration)
+
+        if force or changed_config or (codebase, configuration) != (self.codebase,
+                                                                     self.configuration):
+            self.include_cache.clear()
+            history = incremental.AnalysisHistory(None)
+        else:
+            for path in changed_directories:
+                self.include_cache.invalidate(path)
+            history = self.history
+
+        state = finder.find(self.rootdir, codebase, configuration, cache=self.trees,
+                            history=history, include_cache=self.include_cache)
+        setmap = PlatformMapper(codebase).walk(state)
+        (files, directories) = self._watch(state, codebase, configuration, directories,
+                                           started)
+        history.save()
+        log.info("Replayed %d compilation commands; re-analyzed %d",
+                 history.hits, history.misses)
+        history.hits = history.misses = 0
+
+        # Only update the server once the analysis has succeeded, so that
+        # a failure (e.g. a half-written file) is retried on the next query
+        self.codebase = codebase
+        self.configuration = configuration
+        self.state = state
+        self.history = history
+        self.setmap = setmap
+        (self._config_files, self._files, self._directories) = (config_files, files,
+                                                                directories)
+        self.trees.prune(state.get_filenames())
+        self._checked = time.monotonic()
+        return changed
+
+    def _filename(self, params):
+        """
+        Return the internal filename for the "file" parameter of a query.
+        """
+        fn = params.get("file")
+        if not isinstance(fn, str):
+            raise InvalidParams("Expected a 'file' parameter")
+        fn = os.path.realpath(os.path.join(self.rootdir, fn))
+        if not os.path.exists(fn) or self.state.get_tree(fn) is None:
+            raise InvalidParams(f"{fn} is not part of the analysis")
+        return fn
+
+    def query_platforms(self, params):
+        """
+        Return the platforms that use a file, and the platforms that use
+        each of its regions. If start_line and/or end_line are given,
+        only regions overlapping those lines are considered.
+        """
+        fn = self._filename(params)
+        start = params.get("start_line", None)
+        end = params.get("end_line", None)
+        for value in [start, end]:
+            if value is not None and (not isinstance(value, int) or isinstance(value, bool)):
+                raise InvalidParams("Line numbers must be integers")
+
+        node_masks = self.state.get_masks(fn)
+        regions = []
+        used = 0
+        for node in self.state.get_tree(fn).iter_nodes():
+            if not isinstance(node, CodeNode):
+                continue
+            if start is not None and node.end_line < start:
+                continue
+            if end is not None and node.start_line > end:
+                continue
+            mask = node_masks.get(node, 0)
+            used |= mask
+            regions.append({"start_line": node.start_line,
+                            "end_line": node.end_line,
+                            "num_lines": node.num_lines,
+                            "platforms": sorted(self.state.platform_set(mask))})
+        return {"file": fn,
+                "platforms": sorted(self.state.platform_set(used)),
+                "regions": regions}
+
+    def query_summary(self, params):
+        """
+        Return the number of lines of code used by each set of platforms.
+        """
+        setmap = [{"platforms": sorted(pset), "lines": lines}
+                  for (pset, lines) in self.setmap.items()]
+        setmap.sort(key=lambda entry: (len(entry["platforms"]), entry["platforms"]))
+        return {"platforms": list(self.codebase["platforms"]), "setmap": setmap}
+
+    def query_refresh(self, params):
+        """
+        Check for changes immediately, and return the paths that changed.
+        """
+        return {"changed": self.refresh(force=bool(params.get("force", False)))}
+
+    def query_shutdown(self, params):
+        """
+        Stop serving once the current request has been answered.
+        """
+        self.stopped = True
+        return None
+
+    # Maps each method to (function, whether to check for changes first)
+    methods = {"platforms": (query_platforms, True),
+               "summary": (query_summary, True),
+               "refresh": (query_refresh, False),
+               "shutdown": (query_shutdown, False)}
+
+    def _call(self, request):
+        """
+        Answer a single JSON-RPC request object.
+        Return a response object, or None for a notification.
+        """
+        request_id = request.get("id") if isinstance(request, dict) else None
+
+        def error(code, message):
+            return {"jsonrpc": "2.0", "id": request_id,
+                    "error": {"code": code, "message": message}}
+
+        if (not isinstance(request, dict) or request.get("jsonrpc") != "2.0"
+                or not isinstance(request.get("method"), str)):
+            return error(INVALID_REQUEST, "Invalid request")
+        if request["method"] not in self.methods:
+            response = error(METHOD_NOT_FOUND, f"Unknown method {request['method']}")
+        else:
+            (method, check) = self.methods[request["method"]]
+            params = request.get("params", {})
+            if not isinstance(params, dict):
+                response = error(INVALID_PARAMS, "Parameters must be an object")
+            else:
+                try:
+                    if check:
+                        self.refresh()
+                    response = {"jsonrpc": "2.0", "id": request_id,
+                                "result": method(self, params)}
+                except InvalidParams as e:
+                    response = error(INVALID_PARAMS, str(e))
+                except Exception as e:  # pylint: disable=broad-except
+                    log.error("Failed to answer %s: %s", request["method"], e)
+                    response = error(INTERNAL_ERROR, str(e))
+
+        if "id" not in request:
+            return None
+        return response
+
+    def handle(self, line):
+        """
+        Answer a line containing a JSON-RPC request (or batch of
+        requests), and return the response as a line, or None if no
+        response is required.
+        """
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {"jsonrpc": "2.0", "id": None,
+                        "error": {"code": PARSE_ERROR, "message": "Parse error"}}
+            return json.dumps(response)
+
+        if isinstance(request, list):
+            if not request:
+                response = self._call(None)
+            else:
+                response = [r for r in map(self._call, request) if r is not None] or None
+        else:
+            response = self._call(request)
+        if response is None:
+            return None
+        return json.dumps(response)
+
+
+def serve_stream(server, instream, outstream):
+    """
+    Answer newline-delimited JSON-RPC requests read from instream,
+    writing each response to outstream on a single line.
+    """
+    for line in instream:
+        if not line.strip():
+            continue
+        response = server.handle(line)
+        if response is not None:
+            outstream.write(response + "\n")
+            outstream.flush()
+        if server.stopped:
+            break
+
+
+def serve_socket(server, path):
+    """
+    Answer newline-delimited JSON-RPC requests from clients connecting
+    to a Unix domain socket at path, one client at a time.
+    """
+    import socket
+
+    if os.path.exists(path):
+        raise RuntimeError(f"{path} already exists; remove it if no server is using it.")
+
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        # Only the current user may connect
+        umask = os.umask(0o177)
+        try:
+            sock.bind(path)
+        finally:
+            os.umask(umask)
+        try:
+            sock.listen()
+            log.info("Listening on %s", path)
+            while not server.stopped:
+                (connection, _) = sock.accept()
+                with connection, connection.makefile("r") as instream, \
+                        connection.makefile("w") as outstream:
+                    serve_stream(server, instream, outstream)
+        finally:
+            os.unlink(path)
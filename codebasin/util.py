@@ -16,7 +16,6 @@ import hashlib
 import logging
 
 import json
-import jsonschema
 
 _coverage_schema_id = (
     "https://raw.githubusercontent.com/intel/"
@@ -51,20 +50,59 @@ _coverage_schema = {
 
 log = logging.getLogger("codebasin")
 
+# Registry of file digests, shared by everything that needs to hash a
+# file. Maps each path to a ((mtime, size), digest) tuple.
+_file_hashes = {}
+
 
 def compute_file_hash(fname):
-    """Return sha512 for fname"""
-    chunk_size = 4096
+    """
+    Return sha512 for fname.
+
+    Digests are recorded in a registry alongside the modification time
+    and size of the file, so an unmodified file is only read once.
+    """
+    st = os.lstat(fname)
+    fingerprint = (st.st_mtime_ns, st.st_size)
+    try:
+        (known_fingerprint, digest) = _file_hashes[fname]
+        if known_fingerprint == fingerprint:
+            return digest
+    except KeyError:
+        pass
+
+    chunk_size = 1 << 20
     hasher = hashlib.sha512()
     with safe_open_read_nofollow(fname, 'rb') as in_file:
-        for chunk in iter(lambda: in_file.read(chunk_size), b""):
-            hasher.update(chunk)
-    return hasher.hexdigest()
+        st = os.fstat(in_file.fileno())
+        buffer = memoryview(bytearray(chunk_size))
+        while True:
+            nbytes = in_file.readinto(buffer)
+            if not nbytes:
+                break
+            hasher.update(buffer[:nbytes])
+    digest = hasher.hexdigest()
+    _file_hashes[fname] = ((st.st_mtime_ns, st.st_size), digest)
+    return digest
+
+
+def read_file(fname):
+    """
+    Return the contents of fname as bytes, without following links.
+
+    The digest of the contents is recorded in the same registry as
+    compute_file_hash, so the file is not read again to hash it.
+    """
+    with safe_open_read_nofollow(fname, 'rb') as in_file:
+        st = os.fstat(in_file.fileno())
+        data = in_file.read()
+    _file_hashes[fname] = ((st.st_mtime_ns, st.st_size), hashlib.sha512(data).hexdigest())
+    return data
 
 
 def ensure_ext(fname, extensions):
     """Return true if the path passed in has specified extension"""
-    if not isinstance(extensions, Iterable):
+    if isinstance(extensions, str) or not isinstance(extensions, Iterable):
         extensions = [extensions]
 
     split = splitext(fname)
@@ -94,6 +132,16 @@ def ensure_json(fname):
     return ensure_ext(fname, ".json")
 
 
+def ensure_jsonl(fname):
+    """Return true if the path passed in specifies a JSON Lines file"""
+    return ensure_ext(fname, ".jsonl")
+
+
+def ensure_npz(fname):
+    """Return true if the path passed in specifies a NumPy archive"""
+    return ensure_ext(fname, ".npz")
+
+
 def safe_open_write_binary(fname):
     """Open fname for (binary) writing. Truncate if not a symlink."""
     fpid = os.open(fname, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_NOFOLLOW, 0o666)
@@ -148,6 +196,8 @@ def validate_coverage_json(json_string: str) -> bool:
     if not isinstance(json_string, str):
         raise TypeError("Coverage must be a JSON string.")
 
+    import jsonschema
+
     instance = json.loads(json_string)
 
     try:
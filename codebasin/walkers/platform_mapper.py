@@ -4,13 +4,11 @@
 import logging
 import collections
 from .tree_mapper import TreeMapper
-from codebasin.preprocessor import FileNode, CodeNode
+from codebasin.codebase import CodeBaseIndex
+from codebasin.preprocessor import CodeNode
 
 log = logging.getLogger('codebasin')
 
-def exclude(filename, cb):
-    return (filename not in cb["files"] or filename in cb["exclude_files"])
-
 class PlatformMapper(TreeMapper):
     """
     Specific TreeMapper that builds a mapping of nodes to platforms.
@@ -21,20 +19,30 @@ class PlatformMapper(TreeMapper):
         self.codebase = codebase
         self._null_set = frozenset([])
 
-    def _map_node(self, _node, _map):
+    def walk(self, state):
         """
-        Map a specific node to its platform set, and descend into the
-        children nodes.
+        Build the mapping of platform sets to lines of code, iterating
+        over the nodes of each tree in pre-order.
+
+        Lines are accumulated per association bitmask, so that each
+        distinct platform set is only built once.
         """
-        # Do not map files that the user does not consider to be part of
-        # the codebase
-        if isinstance(_node, FileNode) and exclude(_node.filename, self.codebase):
-            return
-
-        if isinstance(_node, CodeNode):
-            association = _map[_node]
-            platform = frozenset(association)
-            self.line_map[platform] += _node.num_lines
-
-        for child in _node.children:
-            self._map_node(child, _map)
+        if not self.line_map:
+            codebase_index = CodeBaseIndex.from_codebase(self.codebase)
+            groups = collections.Counter()
+            for fn in state.get_filenames():
+                tree = state.get_tree(fn)
+
+                # Do not map files that the user does not consider to be
+                # part of the codebase
+                if codebase_index.excludes(tree.root.filename):
+                    continue
+
+                node_masks = state.get_masks(fn)
+                for node in tree.iter_nodes():
+                    if isinstance(node, CodeNode):
+                        groups[node_masks.get(node, 0)] += node.num_lines
+
+            for (mask, count) in groups.items():
+                self.line_map[state.platform_set(mask)] += count
+        return self.line_map
@@ -16,8 +16,11 @@ class TreeAssociator(TreeWalker):
 
     def walk(self, platform, state):
         """
-        Walk the tree, associating nodes with platforms
+        Walk the tree, associating nodes with platforms.
+        Associations are recorded by setting the platform's bit in each
+        node's bitmask.
         """
+        self._bit = state.platform_bit(platform.name)
         _ = self._associate_nodes(self.tree.root, platform, state, True)
 
     def _associate_nodes(self, node, platform, state, process_children):
@@ -25,7 +28,9 @@ class TreeAssociator(TreeWalker):
         Associate this node with the platform. Evaluate the node,
         and (if the evaluation say to) descend into the children nodes.
         """
-        self._node_associations[node].add(platform.name)
+        self._node_associations[node] |= self._bit
+        for summary in platform.recorders:
+            summary.visits[self.tree.root.filename].add(node)
 
         node_processed = False
         eval_args = {'platform': platform,
@@ -0,0 +1,88 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import glob
+import io
+import random
+from codebasin import file_source
+
+
+def _run(text, cleaner_class, directives_only):
+    """
+    Return everything observable from running c_file_source on text.
+    """
+    results = []
+    source = file_source.c_file_source(io.StringIO(text), relaxed=True,
+                                       directives_only=directives_only,
+                                       cleaner_class=cleaner_class)
+    try:
+        while True:
+            line = next(source)
+            results.append(line.logical_result())
+    except StopIteration as it:
+        results.append(it.value)
+    except RuntimeError as e:
+        results.append(type(e))
+    return results
+
+
+class TestFastCCleaner(unittest.TestCase):
+    """
+    Test that fast_c_cleaner produces exactly the same output as the
+    reference c_cleaner.
+    """
+
+    def assertEquivalent(self, text):
+        for directives_only in [False, True]:
+            self.assertEqual(_run(text, file_source.fast_c_cleaner, directives_only),
+                             _run(text, file_source.c_cleaner, directives_only),
+                             repr(text))
+
+    def test_tricky_lines(self):
+        """c_cleaner/tricky_lines"""
+        lines = ["int a;  // comment\n",
+                 "  #  define X /* block */ 1\n",
+                 "a /* multi\nline */ b\n",
+                 "a /* star **/ b /***/ c\n",
+                 "a /* ends with star *\n/ still comment */ b\n",
+                 "\"string // not a comment /* \\\" */\"\n",
+                 "'/' '\\'' '//' x\n",
+                 "'/* */' y\n",
+                 "x = a / b;\n",
+                 "x = a /\n",
+                 "#define LONG \\\n  continued \\\n  line\n",
+                 "// comment \\\n continued comment\nint b;\n",
+                 "a\\\n#b\n",
+                 "\t \x0c\x0b a 　 b\r\n",
+                 "\\\\\n",
+                 "/\\\n/ comment\n",
+                 "/\\\n* comment */ x\n",
+                 "\"unterminated\n'also\nx\n",
+                 "/* unterminated\n",
+                 "#include <a/b.h> // c\n",
+                 "",
+                 "\n\n\n"]
+        for line in lines:
+            self.assertEquivalent(line)
+
+    def test_random(self):
+        """c_cleaner/random"""
+        rng = random.Random(0)
+        alphabet = ["a", "b", " ", "\t", "#", "/", "*", "\\", "\"", "'", "\n", "\n", "\r"]
+        for _ in range(2000):
+            text = "".join(rng.choice(alphabet) for _ in range(rng.randint(0, 40)))
+            if text.endswith("\\"):
+                text += "\n"
+            self.assertEquivalent(text)
+
+    def test_sources(self):
+        """c_cleaner/sources"""
+        for fn in sorted(glob.glob("./tests/**/*.[ch]", recursive=True) +
+                         glob.glob("./tests/**/*.[ch]pp", recursive=True)):
+            with open(fn, "r", errors="replace") as f:
+                self.assertEquivalent(f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()
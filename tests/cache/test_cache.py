@@ -0,0 +1,63 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+from codebasin import cache, config, finder
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestParseCache(unittest.TestCase):
+    """
+    Test that trees loaded from the parse cache produce the same results
+    as trees built by parsing.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/include/"
+        self.cachedir = tempfile.mkdtemp()
+        logging.getLogger("codebasin").disabled = True
+
+        self.expected_setmap = {frozenset(['CPU']): 11,
+                                frozenset(['GPU']): 12,
+                                frozenset(['CPU', 'GPU']): 16}
+
+    def tearDown(self):
+        shutil.rmtree(self.cachedir)
+
+    def _setmap(self, parse_cache):
+        codebase, configuration = config.load("./tests/include/include.yaml", self.rootdir)
+        state = finder.find(self.rootdir, codebase, configuration, cache=parse_cache)
+        mapper = PlatformMapper(codebase)
+        return mapper.walk(state)
+
+    def test_cold_and_warm(self):
+        """cache/cold_and_warm"""
+        parse_cache = cache.ParseCache(self.cachedir)
+        self.assertDictEqual(self._setmap(parse_cache), self.expected_setmap,
+                             "Mismatch in setmap (cold cache)")
+
+        entries = [f for (_, _, files) in os.walk(self.cachedir) for f in files]
+        self.assertTrue(len(entries) > 0)
+
+        self.assertDictEqual(self._setmap(parse_cache), self.expected_setmap,
+                             "Mismatch in setmap (warm cache)")
+
+    def test_invalid_entry(self):
+        """cache/invalid_entry"""
+        parse_cache = cache.ParseCache(self.cachedir)
+        fn = os.path.realpath("./tests/include/main.cpp")
+        path = parse_cache._path(fn, True)
+        os.makedirs(os.path.dirname(path))
+        with open(path, "wb") as f:
+            f.write(b"not a pickle")
+        self.assertIsNone(parse_cache.load(fn, True))
+        self.assertDictEqual(self._setmap(parse_cache), self.expected_setmap,
+                             "Mismatch in setmap")
+
+
+if __name__ == '__main__':
+    unittest.main()
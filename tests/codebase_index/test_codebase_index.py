@@ -0,0 +1,49 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+from codebasin.codebase import CodeBaseIndex
+
+
+class TestCodeBaseIndex(unittest.TestCase):
+    """
+    Test membership and directory queries against a code base index.
+    """
+
+    def setUp(self):
+        self.codebase = {"files": ["/src/a.cpp", "/src/sub/b.cpp", "/src/sub/c.h",
+                                   "/src-old/d.cpp", "/src.bak/e.cpp", "/other/f.cpp"],
+                         "platforms": ["CPU"],
+                         "exclude_files": frozenset(["/src/sub/c.h"])}
+        self.index = CodeBaseIndex.from_codebase(self.codebase)
+
+    def test_membership(self):
+        """Check that listed and excluded files are distinguished"""
+        self.assertIn("/src/a.cpp", self.index)
+        self.assertNotIn("/src/missing.cpp", self.index)
+        self.assertEqual(len(self.index), 6)
+
+        self.assertFalse(self.index.excludes("/src/a.cpp"))
+        self.assertTrue(self.index.excludes("/src/sub/c.h"))
+        self.assertTrue(self.index.excludes("/src/missing.cpp"))
+
+        index = CodeBaseIndex.from_codebase({"files": ["/src/a.cpp"], "platforms": []})
+        self.assertFalse(index.excludes("/src/a.cpp"))
+
+    def test_directories(self):
+        """Check that directory queries only match whole components"""
+        self.assertEqual(self.index.files_in("/src"),
+                         ["/src/a.cpp", "/src/sub/b.cpp", "/src/sub/c.h"])
+        self.assertEqual(self.index.files_in("/src/"),
+                         ["/src/a.cpp", "/src/sub/b.cpp", "/src/sub/c.h"])
+        self.assertEqual(self.index.files_in("/src/sub"), ["/src/sub/b.cpp", "/src/sub/c.h"])
+        self.assertEqual(self.index.files_in("/"), sorted(self.codebase["files"]))
+        self.assertEqual(self.index.files_in("/missing"), [])
+
+        self.assertTrue(self.index.contains_directory("/src-old"))
+        self.assertFalse(self.index.contains_directory("/sr"))
+        self.assertFalse(self.index.contains_directory("/src/a.cpp"))
+
+
+if __name__ == '__main__':
+    unittest.main()
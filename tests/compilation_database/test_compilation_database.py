@@ -0,0 +1,123 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import io
+import json
+import logging
+import os
+import random
+import shlex
+import tempfile
+import jsonschema
+from codebasin import config
+
+
+class TestCompilationDatabase(unittest.TestCase):
+    """
+    Test that the streaming compilation database loader is equivalent
+    to parsing and validating the whole database at once.
+    """
+
+    def setUp(self):
+        logging.getLogger("codebasin").disabled = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rootdir = os.path.realpath(self.tmp.name)
+        os.makedirs(os.path.join(self.rootdir, "src"))
+        for fn in ["a.cpp", "b.cpp"]:
+            with open(os.path.join(self.rootdir, "src", fn), "w") as f:
+                f.write("int x;\n")
+        os.symlink(os.path.join(self.rootdir, "src", "a.cpp"),
+                   os.path.join(self.rootdir, "link.cpp"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_iter_json_array(self):
+        """Check that arrays are decoded across chunk boundaries"""
+        documents = ['[]', ' [ ] ', '[1, 22, 333]', '[{"a": [1, 2]}, "x,]", true, null]\n',
+                     '[12345678901234567890, -1.5e10, {"k": "v\\u00e9"}]']
+        for document in documents:
+            for chunk_size in [1, 2, 3, 7, 1024]:
+                values = list(config._iter_json_array(io.StringIO(document), chunk_size))
+                self.assertEqual(values, json.loads(document), (document, chunk_size))
+
+        invalid = ['', '[', '[1', '[1,]', '[,1]', '[1 2]', '[1] x', '{"a": 1}', '"x"', '{']
+        for document in invalid:
+            for chunk_size in [1, 3, 1024]:
+                with self.assertRaises(ValueError, msg=document):
+                    list(config._iter_json_array(io.StringIO(document), chunk_size))
+
+    def test_valid_command(self):
+        """Check structural validation against the schema"""
+        entries = [{"file": "a.cpp", "command": "gcc a.cpp"},
+                   {"file": "a.cpp", "arguments": ["gcc", "a.cpp"], "output": "a.o"},
+                   {"file": "a.cpp", "directory": "/src", "arguments": []},
+                   {"file": "a.cpp"},
+                   {"file": 1, "command": "gcc"},
+                   {"directory": ["not", "a", "directory"], "arguments": ["gcc"]},
+                   {"arguments": ["gcc", 1]},
+                   {"arguments": "gcc"},
+                   {"command": None},
+                   "gcc a.cpp",
+                   ["gcc"]]
+        for entry in entries:
+            try:
+                jsonschema.validate(instance=[entry], schema=config._compiledb_schema)
+                expected = True
+            except jsonschema.ValidationError:
+                expected = False
+            self.assertEqual(config._valid_command(entry), expected, entry)
+
+    def test_extract_flags(self):
+        """Check one-pass extraction against the separate extractors"""
+        vocabulary = ["-D", "-DFOO", "-DBAR=1", "-I", "-Iinc", "-isystem", "-include",
+                      "a.h", "b", "-c", "-o", "", "-Dx", "-I/usr/include"]
+        rng = random.Random(0)
+        for _ in range(500):
+            args = [rng.choice(vocabulary) for _ in range(rng.randrange(12))]
+            expected = (config.extract_defines(args), config.extract_include_paths(args),
+                        config.extract_include_files(args))
+            self.assertEqual(config.extract_flags(args), expected, args)
+
+    def test_split_command(self):
+        """Check command splitting against shlex.split"""
+        commands = ["gcc -c a.cpp", "  gcc\t-DX=1 \n a.cpp ", "", "gcc -D'X=1 2' a.cpp",
+                    'gcc -DX="a b" a.cpp', "gcc a\\ b.cpp", "gcc -DX=1\x0ba.cpp",
+                    "gcc -DX=é a.cpp", "gcc # not a comment"]
+        for command in commands:
+            self.assertEqual(config.split_command(command), shlex.split(command), command)
+
+    def test_load_database(self):
+        """Check loaded entries, sharing and missing files"""
+        db = [{"directory": self.rootdir, "file": "src/a.cpp",
+               "command": "g++ -DA -Iinclude -c src/a.cpp"},
+              {"directory": self.rootdir, "file": "src/b.cpp",
+               "command": "g++ -DA -Iinclude -c src/b.cpp"},
+              {"directory": self.rootdir, "file": os.path.join(self.rootdir, "link.cpp"),
+               "arguments": ["g++", "-include", "pre.h", "-c", "link.cpp"]},
+              {"directory": self.rootdir, "file": "src/missing.cpp",
+               "arguments": ["g++", "-c", "src/missing.cpp"]}]
+        dbpath = os.path.join(self.rootdir, "compile_commands.json")
+        with open(dbpath, "w") as f:
+            json.dump(db, f)
+
+        configuration = config.load_database(dbpath, self.rootdir)
+        src = os.path.join(self.rootdir, "src")
+        self.assertEqual([e["file"] for e in configuration],
+                         [os.path.join(src, "a.cpp"), os.path.join(src, "b.cpp"),
+                          os.path.join(src, "a.cpp")])
+        self.assertEqual(configuration[0]["defines"], ["A"])
+        self.assertEqual(configuration[0]["include_paths"],
+                         [os.path.join(self.rootdir, "include")])
+        self.assertIs(configuration[0]["include_paths"], configuration[1]["include_paths"])
+        self.assertEqual(configuration[2]["include_files"], ["pre.h"])
+
+        with open(dbpath, "w") as f:
+            json.dump(db + [{"file": "src/a.cpp"}], f)
+        with self.assertRaises(ValueError):
+            config.load_database(dbpath, self.rootdir)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,39 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+"""
+Contains helpers for tests that run over every configuration file in
+the test suite.
+"""
+
+import glob
+import os
+from codebasin import config, finder
+
+# Configuration files that cannot be analyzed, and the error they raise
+EXPECTED_FAILURES = {
+    # Assembly files in the PTX language are not supported
+    "./tests/basic_asm/basic_asm_ptx.yaml": RuntimeError,
+    # Fails schema validation on purpose
+    "./tests/schema/invalid_config.yaml": ValueError,
+}
+
+
+def load_configs(testcase):
+    """
+    Yield (config_file, rootdir, codebase, configuration) for every
+    configuration file in the test suite that can be analyzed, and
+    check that the others fail with the expected error.
+    """
+    config_files = sorted(glob.glob("./tests/*/*.yaml"))
+    for config_file in EXPECTED_FAILURES:
+        testcase.assertIn(config_file, config_files)
+
+    for config_file in config_files:
+        rootdir = os.path.dirname(config_file) + "/"
+        if config_file in EXPECTED_FAILURES:
+            with testcase.assertRaises(EXPECTED_FAILURES[config_file], msg=config_file):
+                codebase, configuration = config.load(config_file, rootdir)
+                finder.find(rootdir, codebase, configuration)
+            continue
+        codebase, configuration = config.load(config_file, rootdir)
+        yield (config_file, rootdir, codebase, configuration)
@@ -0,0 +1,60 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import os
+import tempfile
+from codebasin import platform
+
+
+class TestDirectoryIndex(unittest.TestCase):
+    """
+    Test that the directory index answers existence queries in the same
+    way as os.path.isfile.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rootdir = self.tmp.name
+        os.makedirs(os.path.join(self.rootdir, "sub", "nested"))
+        for fn in ["a.h", os.path.join("sub", "b.h"), os.path.join("sub", "nested", "c.h")]:
+            with open(os.path.join(self.rootdir, fn), "w") as f:
+                f.write("int x;\n")
+        os.symlink(os.path.join(self.rootdir, "a.h"), os.path.join(self.rootdir, "link.h"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_isfile(self):
+        """Check queries against os.path.isfile"""
+        index = platform.DirectoryIndex()
+        queries = ["a.h", "b.h", "link.h", "sub", "sub/b.h", "sub/nested/c.h",
+                   "sub/missing.h", "missing/a.h", "sub/../a.h", "./a.h",
+                   "sub//b.h", os.path.join(self.rootdir, "a.h")]
+        for query in queries:
+            expected = os.path.isfile(os.path.join(self.rootdir, query))
+            self.assertEqual(index.isfile(self.rootdir, query), expected, query)
+
+        self.assertFalse(index.isfile(os.path.join(self.rootdir, "missing"), "a.h"))
+
+    def test_invalidation(self):
+        """Check that listings are refreshed according to the policy"""
+        index = platform.DirectoryIndex()
+        revalidating = platform.RevalidatingDirectoryIndex()
+        self.assertFalse(index.isfile(self.rootdir, "new.h"))
+        self.assertFalse(revalidating.isfile(self.rootdir, "new.h"))
+
+        with open(os.path.join(self.rootdir, "new.h"), "w") as f:
+            f.write("int y;\n")
+        st = os.stat(self.rootdir)
+        os.utime(self.rootdir, ns=(st.st_atime_ns, st.st_mtime_ns + 1000000000))
+
+        self.assertFalse(index.isfile(self.rootdir, "new.h"))
+        self.assertTrue(revalidating.isfile(self.rootdir, "new.h"))
+
+        index.invalidate(self.rootdir)
+        self.assertTrue(index.isfile(self.rootdir, "new.h"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,78 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import glob
+import logging
+import os
+import tempfile
+from codebasin import config
+
+
+class TestDiscovery(unittest.TestCase):
+    """
+    Test that patterns expanded together during a single walk match the
+    same paths as glob.glob, sorted.
+    """
+
+    def setUp(self):
+        logging.getLogger("codebasin").disabled = True
+        self.tmp = tempfile.TemporaryDirectory()
+        self.rootdir = os.path.realpath(self.tmp.name)
+        files = ["main.cpp", "main.h", ".hidden.cpp",
+                 "src/a.cpp", "src/b.c", "src/.c.cpp",
+                 "src/sub/d.cpp", "src/sub/deeper/e.cpp", "src/sub/deeper/e.h",
+                 "src/.git/f.cpp", "src/third_party/g.cpp", "src/third_party/h.h",
+                 "include/x[1].h", "include/y.h"]
+        for fn in files:
+            path = os.path.join(self.rootdir, fn)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w") as f:
+                f.write("int x;\n")
+        os.symlink(os.path.join(self.rootdir, "src", "sub"),
+                   os.path.join(self.rootdir, "linked"))
+        os.symlink(os.path.join(self.rootdir, "src"),
+                   os.path.join(self.rootdir, "src", "sub", "loop"))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_glob_equivalence(self):
+        """Check expansions against glob.glob"""
+        patterns = ["*.cpp", ".*.cpp", "*", "**", "**/*.cpp", "**/*.h",
+                    "src/*.cpp", "src/*.[ch]*", "src/**/*.cpp", "src/**",
+                    "src/sub/**/*.cpp", "src/.*/*.cpp", "src/.git/*.cpp",
+                    "src/*/deeper/*.h", "src/third_party/**", "linked/**/*.cpp",
+                    "include/x[[]1].h", "include/?.h", "missing/**/*.cpp",
+                    "main.cpp", "src/sub/../a.cpp", "src/*/../a.cpp", "src/*/",
+                    "src/**/deeper/*.h"]
+        patterns = [os.path.join(self.rootdir, p) for p in patterns]
+        expanded = config.expand_paths(patterns)
+
+        for pattern in patterns:
+            # glob follows symbolic link loops, repeating earlier matches
+            expected = [os.path.realpath(p) for p in glob.glob(pattern, recursive=True)]
+            self.assertEqual(set(expanded[pattern]), set(expected), pattern)
+            self.assertEqual(expanded[pattern], sorted(expanded[pattern]), pattern)
+
+    def test_load(self):
+        """Check that exclude patterns are expanded alongside files"""
+        cfg = {"codebase": {"files": ["src/**/*.cpp"],
+                            "exclude_files": ["src/third_party/*"],
+                            "platforms": ["CPU"]},
+               "CPU": {"files": ["src/*.cpp"]}}
+        expanded = config.expand_paths(os.path.join(self.rootdir, f)
+                                       for f in config._config_patterns(cfg))
+        codebase = config.load_codebase(cfg, self.rootdir, expanded.__getitem__)
+        cpu = config.load_platform(cfg, self.rootdir, "CPU", expanded.__getitem__)
+
+        src = os.path.join(self.rootdir, "src")
+        self.assertIn(os.path.join(src, "third_party", "g.cpp"), codebase["files"])
+        self.assertEqual(codebase["exclude_files"],
+                         frozenset([os.path.join(src, "third_party", "g.cpp"),
+                                    os.path.join(src, "third_party", "h.h")]))
+        self.assertEqual([e["file"] for e in cpu], [os.path.join(src, "a.cpp")])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import hashlib
+import os
+import shutil
+import tempfile
+
+from codebasin import util
+
+
+class TestFileHash(unittest.TestCase):
+    """
+    Test that compute_file_hash returns the sha512 of a file, and that
+    digests recorded in the registry are invalidated by modification.
+    """
+
+    def setUp(self):
+        self.testdir = tempfile.mkdtemp()
+        self.path = os.path.join(self.testdir, "file.bin")
+
+    def tearDown(self):
+        shutil.rmtree(self.testdir)
+
+    def _write(self, data, mtime_ns):
+        with open(self.path, "wb") as f:
+            f.write(data)
+        os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_digest(self):
+        """Check that digests match hashlib for small and large files"""
+        for data in [b"", b"int main() {}\n", os.urandom(3 * (1 << 20) + 7)]:
+            util._file_hashes.clear()
+            self._write(data, 10**18)
+            self.assertEqual(util.compute_file_hash(self.path),
+                             hashlib.sha512(data).hexdigest())
+
+    def test_modified(self):
+        """Check that a modified file is hashed again"""
+        self._write(b"before\n", 10**18)
+        self.assertEqual(util.compute_file_hash(self.path),
+                         hashlib.sha512(b"before\n").hexdigest())
+
+        self._write(b"after!\n", 2 * 10**18)
+        self.assertEqual(util.compute_file_hash(self.path),
+                         hashlib.sha512(b"after!\n").hexdigest())
+
+
+if __name__ == '__main__':
+    unittest.main()
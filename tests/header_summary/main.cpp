@@ -0,0 +1,14 @@
+#include "guard.h"
+#include "guard.h"
+#include "mode.h"
+#undef MODE
+#define MODE 3
+#include "mode.h"
+#include "once.h"
+#include "once.h"
+#ifdef GUARD_H
+int guarded;
+#endif
+#if ONCE_VALUE
+int after_once;
+#endif
@@ -0,0 +1,7 @@
+#if MODE == 1
+int one;
+#elif MODE == 2
+int two;
+#else
+int other;
+#endif
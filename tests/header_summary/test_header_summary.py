@@ -0,0 +1,75 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+import os
+from codebasin import config, finder
+from codebasin.walkers.platform_mapper import PlatformMapper
+from tests.configs import load_configs
+
+
+def _associate(rootdir, codebase, configuration, summarize_headers):
+    """
+    Associate all compilation commands, with or without header
+    summaries, and return the resulting state.
+    """
+    state = finder.ParserState(True)
+    state.summarize_headers = summarize_headers
+    state.insert_files(list(codebase["files"]))
+    for p in configuration:
+        for e in configuration[p]:
+            state.insert_file(e["file"])
+            finder.associate(state, rootdir, p, e)
+    return state
+
+
+class TestHeaderSummary(unittest.TestCase):
+    """
+    Test that replaying summarized header walks gives the same results
+    as walking headers every time they are included.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/header_summary/"
+        logging.getLogger("codebasin").disabled = True
+
+        self.expected_setmap = {frozenset(['CPU', 'GPU']): 26,
+                                frozenset(['CPU']): 1,
+                                frozenset(['GPU']): 1}
+
+    def test_yaml(self):
+        """header_summary/header_summary.yaml"""
+        codebase, configuration = config.load("./tests/header_summary/header_summary.yaml",
+                                              self.rootdir)
+        state = finder.find(self.rootdir, codebase, configuration)
+        mapper = PlatformMapper(codebase)
+        setmap = mapper.walk(state)
+        self.assertDictEqual(setmap, self.expected_setmap, "Mismatch in setmap")
+
+    def test_replay(self):
+        """header_summary/replay"""
+        codebase, configuration = config.load("./tests/header_summary/header_summary.yaml",
+                                              self.rootdir)
+        state = _associate(self.rootdir, codebase, configuration, True)
+
+        # mode.h is reached with three different values of MODE, and
+        # guard.h with and without its guard defined.
+        summaries = {os.path.basename(fn): len(s)
+                     for ((fn, _), s) in state.header_summaries.items()}
+        self.assertEqual(summaries, {"guard.h": 2, "mode.h": 3, "once.h": 1})
+
+    def test_equivalence(self):
+        """header_summary/equivalence"""
+        for (config_file, rootdir, codebase, configuration) in load_configs(self):
+            results = []
+            for summarize_headers in [True, False]:
+                state = _associate(rootdir, codebase, configuration, summarize_headers)
+                maps = {fn: [sorted(state.get_map(fn)[node]) for node in state.trees[fn].nodes()]
+                        for fn in state.get_filenames()}
+                results.append(maps)
+            self.assertEqual(results[0], results[1], config_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,82 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import itertools as it
+import logging
+from codebasin import platform, preprocessor
+
+
+def directive(line):
+    """Parse a single directive into a node."""
+    tokens = preprocessor.Lexer(line).tokenize()
+    return preprocessor.DirectiveParser(tokens).parse()
+
+
+def reference(node, p):
+    """Evaluate a node without the compiled condition."""
+    expanded_tokens = preprocessor.MacroExpander(p).expand(node.tokens)
+    return preprocessor.ExpressionEvaluator(expanded_tokens).evaluate()
+
+
+class TestIfCache(unittest.TestCase):
+    """
+    Test that memoized #if results match a fresh evaluation, and that
+    dependencies are still reported to recorders.
+    """
+
+    def setUp(self):
+        logging.getLogger("codebasin").disabled = True
+
+    def platforms(self):
+        """Yield platforms covering combinations of definitions."""
+        for (a, b, f) in it.product(["", "A", "A=0", "A=2"], ["", "B=A+1", "B=3"],
+                                    ["", "F(x)=x*2", "F(x)=x+1", "F=1"]):
+            p = platform.Platform("P", "")
+            for definition in [a, b, f]:
+                if definition:
+                    macro = preprocessor.macro_from_definition_string(definition)
+                    p.define(macro.name, macro)
+            yield p
+
+    def test_equivalence(self):
+        """Check memoized results against fresh evaluations"""
+        lines = ["#ifdef A", "#ifndef A", "#if defined(A)", "#if !defined A",
+                 "#if A", "#if A + B > 2", "#if F(A) == 4", "#if defined(F) && F(1) > 1",
+                 "#if B || defined(C)", "#elif A == 2"]
+        for line in lines:
+            node = directive(line)
+            for p in self.platforms():
+                for _ in range(2):
+                    self.assertEqual(node.evaluate_for_platform(platform=p), reference(node, p),
+                                     line)
+
+    def test_defined(self):
+        """Check that defined() tests are recognized"""
+        for (line, identifier, negated) in [("#ifdef A", "A", False), ("#ifndef A", "A", True),
+                                            ("#if defined(A)", "A", False),
+                                            ("#if !defined A", "A", True),
+                                            ("#if defined(A) && B", None, False),
+                                            ("#if !A", None, False)]:
+            condition = preprocessor.CompiledCondition(directive(line).tokens)
+            self.assertEqual(condition.identifier, identifier, line)
+            self.assertEqual(condition.negated, negated, line)
+
+    def test_recorded_reads(self):
+        """Check that memoized results re-issue their reads"""
+        node = directive("#if A + B > 2")
+        p = platform.Platform("P", "")
+        macro = preprocessor.macro_from_definition_string("B=A+1")
+        p.define(macro.name, macro)
+
+        node.evaluate_for_platform(platform=p)
+        summary = platform.HeaderSummary()
+        p.recorders.append(summary)
+        node.evaluate_for_platform(platform=p)
+        p.recorders.pop()
+        self.assertEqual(set(summary.reads), {"A", "B"})
+        self.assertEqual(summary.reads["A"], None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,4 @@
+// Copyright (C) 2019-2023 Intel Corporation
+// SPDX-License-Identifier: BSD-3-Clause
+
+int a_common;
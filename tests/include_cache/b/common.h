@@ -0,0 +1,5 @@
+// Copyright (C) 2019-2023 Intel Corporation
+// SPDX-License-Identifier: BSD-3-Clause
+
+int b_common_0;
+int b_common_1;
@@ -0,0 +1,5 @@
+// Copyright (C) 2019-2023 Intel Corporation
+// SPDX-License-Identifier: BSD-3-Clause
+
+// Resolves to b/common.h, relative to this header
+#include "common.h"
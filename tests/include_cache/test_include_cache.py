@@ -0,0 +1,51 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+import os
+from codebasin import config, finder, platform
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestIncludeCache(unittest.TestCase):
+    """
+    Test that include files are resolved relative to the file containing
+    the #include, even when resolutions are shared between commands.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/include_cache/"
+        logging.getLogger("codebasin").disabled = True
+
+        self.expected_setmap = {frozenset(['CPU', 'GPU']): 7}
+
+    def test_yaml(self):
+        """include_cache/include_cache.yaml"""
+        codebase, configuration = config.load("./tests/include_cache/include_cache.yaml",
+                                              self.rootdir)
+        state = finder.find(self.rootdir, codebase, configuration)
+        mapper = PlatformMapper(codebase)
+        setmap = mapper.walk(state)
+        self.assertDictEqual(setmap, self.expected_setmap, "Mismatch in setmap")
+
+    def test_shared_cache(self):
+        """include_cache/shared_cache"""
+        include_cache = platform.IncludeCache()
+        root = os.path.realpath(self.rootdir)
+        p1 = platform.Platform("P1", root, include_cache)
+        p2 = platform.Platform("P2", root, include_cache)
+
+        a = p1.find_include_file("common.h", os.path.join(root, "a"))
+        b = p2.find_include_file("common.h", os.path.join(root, "b"))
+        self.assertEqual(a, os.path.join(root, "a", "common.h"))
+        self.assertEqual(b, os.path.join(root, "b", "common.h"))
+
+        # System includes do not search the including directory
+        self.assertIsNone(p1.find_include_file("common.h", os.path.join(root, "a"), True))
+        p2.add_include_path(os.path.join(root, "b"))
+        self.assertEqual(p2.find_include_file("common.h", os.path.join(root, "a"), True), b)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,98 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+from codebasin import config, finder, incremental
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestIncremental(unittest.TestCase):
+    """
+    Test that incremental re-analysis replays unchanged compilation
+    commands and produces the same results as a full analysis.
+    """
+
+    def setUp(self):
+        self.rootdir = tempfile.mkdtemp()
+        shutil.copytree("./tests/include/headers", os.path.join(self.rootdir, "headers"))
+        for fn in ["main.cpp", "include.yaml"]:
+            shutil.copy(os.path.join("./tests/include", fn), self.rootdir)
+        self.config_file = os.path.join(self.rootdir, "include.yaml")
+        self.history_file = os.path.join(self.rootdir, "history.json")
+        logging.getLogger("codebasin").disabled = True
+
+    def tearDown(self):
+        shutil.rmtree(self.rootdir)
+
+    def _setmap(self, history=None):
+        codebase, configuration = config.load(self.config_file, self.rootdir)
+        state = finder.find(self.rootdir, codebase, configuration, history=history)
+        mapper = PlatformMapper(codebase)
+        return mapper.walk(state)
+
+    def _incremental_setmap(self):
+        history = incremental.AnalysisHistory(self.history_file)
+        setmap = self._setmap(history)
+        history.save()
+        return setmap, history
+
+    def test_unchanged(self):
+        """incremental/unchanged"""
+        expected = self._setmap()
+
+        setmap, history = self._incremental_setmap()
+        self.assertDictEqual(setmap, expected, "Mismatch in setmap (first run)")
+        self.assertEqual((history.hits, history.misses), (0, 2))
+
+        setmap, history = self._incremental_setmap()
+        self.assertDictEqual(setmap, expected, "Mismatch in setmap (second run)")
+        self.assertEqual((history.hits, history.misses), (2, 0))
+
+    def test_changed_header(self):
+        """incremental/changed_header"""
+        self._incremental_setmap()
+
+        # Only the GPU command includes gpu.h
+        with open(os.path.join(self.rootdir, "headers", "gpu.h"), "a") as f:
+            f.write("int extra_gpu_line;\n")
+        expected = self._setmap()
+
+        setmap, history = self._incremental_setmap()
+        self.assertDictEqual(setmap, expected, "Mismatch in setmap")
+        self.assertEqual((history.hits, history.misses), (1, 1))
+
+    def test_new_header(self):
+        """incremental/new_header"""
+        self._incremental_setmap()
+
+        # Both commands look for missing.h, and must now find it
+        with open(os.path.join(self.rootdir, "headers", "missing.h"), "w") as f:
+            f.write("int previously_missing;\n")
+        expected = self._setmap()
+
+        setmap, history = self._incremental_setmap()
+        self.assertDictEqual(setmap, expected, "Mismatch in setmap")
+        self.assertEqual((history.hits, history.misses), (0, 2))
+
+
+    def test_jobs(self):
+        """incremental/jobs"""
+        codebase, configuration = config.load(self.config_file, self.rootdir)
+        history = incremental.AnalysisHistory(self.history_file)
+        logger = logging.getLogger("codebasin")
+        logger.disabled = False
+        try:
+            with self.assertLogs(logger, level="WARNING") as logs:
+                state = finder.find(self.rootdir, codebase, configuration, jobs=2,
+                                    history=history)
+        finally:
+            logger.disabled = True
+        self.assertTrue(any("associated serially" in line for line in logs.output))
+        self.assertDictEqual(PlatformMapper(codebase).walk(state), self._setmap())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+from codebasin import preprocessor
+
+
+def evaluate(expression):
+    """Evaluate an expression and return its truth value."""
+    tokens = preprocessor.Lexer(expression).tokenize()
+    return preprocessor.ExpressionEvaluator(tokens).evaluate()
+
+
+class TestIntegerArithmetic(unittest.TestCase):
+    """
+    Test that preprocessor expressions follow the rules of 64-bit
+    signed and unsigned arithmetic in C.
+    """
+
+    def test_true(self):
+        """Check expressions that must be true"""
+        expressions = [
+            "1 + 2 * 3 == 7",
+            "-7 / 2 == -3",
+            "-7 % 2 == -1",
+            "7 % -2 == 1",
+            "1 / 0 == 0",
+            "1 % 0 == 0",
+            "0x7FFFFFFFFFFFFFFF + 1 == -0x7FFFFFFFFFFFFFFF - 1",
+            "-1 < 0",
+            "-1 > 0u",
+            "0u - 1 == 0xFFFFFFFFFFFFFFFFu",
+            "-1 == 0xFFFFFFFFFFFFFFFFu",
+            "~0u == 18446744073709551615u",
+            "~0 == -1",
+            "-1u > 0",
+            "(2 || 0) == 1",
+            "(2 && 3) == 1",
+            "!0 == 1",
+            "1 << 63 < 0",
+            "1u << 63 > 0",
+            "1 << 64 == 0",
+            "1 << -1 == 0",
+            "-8 >> 1 == -4",
+            "-8 >> 64 == -1",
+            "0xFFFFFFFFFFFFFFFFu >> 63 == 1",
+            "(1 ? -1 : 0u) > 0",
+            "(0 ? 2 : 3) == 3",
+            "'a' == 97",
+            "0b101 == 5",
+            "10ULL == 10",
+            "undefined_identifier == 0",
+            "f(1, 2) == 0",
+        ]
+        for expression in expressions:
+            self.assertTrue(evaluate(expression), expression)
+
+    def test_overflow(self):
+        """Check that constants too large for their type are rejected"""
+        for expression in ["9223372036854775808", "0xFFFFFFFFFFFFFFFF",
+                           "18446744073709551616u"]:
+            with self.assertRaises(OverflowError, msg=expression):
+                evaluate(expression)
+        self.assertTrue(evaluate("9223372036854775807"))
+        self.assertTrue(evaluate("18446744073709551615u"))
+
+
+if __name__ == '__main__':
+    unittest.main()
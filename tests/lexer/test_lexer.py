@@ -2,6 +2,8 @@
 # SPDX-License-Identifier: BSD-3-Clause
 
 import unittest
+import glob
+import random
 from codebasin import preprocessor
 
 
@@ -80,6 +82,60 @@ class TestLexer(unittest.TestCase):
         self.assertTrue(isinstance(tokens[5], preprocessor.Operator))
         self.assertTrue(isinstance(tokens[6], preprocessor.StringConstant))
 
+    def test_compact_tokens(self):
+        """compact tokens"""
+        tokens = preprocessor.Lexer("foo + foo").tokenize()
+        self.assertFalse(hasattr(tokens[0], "__dict__"))
+        self.assertIs(tokens[0].token, tokens[2].token)
+
+        # Tokens are only copied if prev_white needs to change
+        self.assertIs(tokens[0].with_prev_white(False), tokens[0])
+        copied = tokens[0].with_prev_white(True)
+        self.assertIsNot(copied, tokens[0])
+        self.assertTrue(copied.prev_white)
+        self.assertFalse(tokens[0].prev_white)
+        self.assertEqual(copied.expandable, tokens[0].expandable)
+
+
+class TestLexerEquivalence(unittest.TestCase):
+    """
+    Test that the regular expression lexer produces the same tokens as
+    the reference lexer.
+    """
+
+    def assertEquivalent(self, string):
+        fast = preprocessor.Lexer(string, 7).tokenize()
+        reference = preprocessor.Lexer(string, 7, reference=True).tokenize()
+        self.assertEqual([repr(t) for t in fast], [repr(t) for t in reference], repr(string))
+
+    def test_tricky_strings(self):
+        """lexer/tricky_strings"""
+        strings = ["1e+5 .5 1.2.3 0x1fULL 1p-3 1e+ 1..e-x 1_000",
+                   "'a' '\\'' '\\n' '\\' 'ab' '' ' ' '\\\t'",
+                   '"abc" "a\\"b" "a\\\\" "unterminated\\"',
+                   "a||b&&c>>d<<e!=f>=g<=h==i##j->k+=l:::m?n~o#p%q",
+                   "( ) { } [ ] , . ; ' \" \\ @ $ `",
+                   "  leading and trailing  \t\r\n",
+                   "_id1 1id id_ __VA_ARGS__",
+                   ""]
+        for string in strings:
+            self.assertEquivalent(string)
+
+    def test_random(self):
+        """lexer/random"""
+        rng = random.Random(0)
+        alphabet = list("ab_1e.+-pP'\"\\ \t#<>=|&@") + ["\x01"]
+        for _ in range(5000):
+            self.assertEquivalent("".join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))))
+
+    def test_sources(self):
+        """lexer/sources"""
+        for fn in sorted(glob.glob("./tests/**/*.[ch]", recursive=True) +
+                         glob.glob("./tests/**/*.[ch]pp", recursive=True)):
+            with open(fn, "r", errors="replace") as f:
+                for line in f:
+                    self.assertEquivalent(line)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,51 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+from codebasin import config, finder
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestParallel(unittest.TestCase):
+    """
+    Test that parsing and association with multiple jobs produce the
+    same results as the serial path.
+    """
+
+    def setUp(self):
+        logging.getLogger("codebasin").disabled = True
+
+    def _setmap(self, rootdir, config_file, jobs):
+        codebase, configuration = config.load(config_file, rootdir)
+        state = finder.find(rootdir, codebase, configuration, jobs=jobs)
+        mapper = PlatformMapper(codebase)
+        return mapper.walk(state), list(state.get_filenames())
+
+    def test_include(self):
+        """parallel/include"""
+        rootdir = "./tests/include/"
+        serial = self._setmap(rootdir, "./tests/include/include.yaml", 1)
+        parallel = self._setmap(rootdir, "./tests/include/include.yaml", 2)
+        self.assertDictEqual(serial[0], parallel[0], "Mismatch in setmap")
+        self.assertEqual(serial[1], parallel[1], "Mismatch in file order")
+
+    def test_include_db(self):
+        """parallel/include-db"""
+        rootdir = "./tests/include/"
+        serial = self._setmap(rootdir, "./tests/include/include-db.yaml", 1)
+        parallel = self._setmap(rootdir, "./tests/include/include-db.yaml", 3)
+        self.assertDictEqual(serial[0], parallel[0], "Mismatch in setmap")
+        self.assertEqual(serial[1], parallel[1], "Mismatch in file order")
+
+    def test_disjoint(self):
+        """parallel/disjoint"""
+        rootdir = "./tests/disjoint/"
+        serial = self._setmap(rootdir, "./tests/disjoint/disjoint.yaml", 1)
+        parallel = self._setmap(rootdir, "./tests/disjoint/disjoint.yaml", 4)
+        self.assertDictEqual(serial[0], parallel[0], "Mismatch in setmap")
+        self.assertEqual(serial[1], parallel[1], "Mismatch in file order")
+
+
+if __name__ == '__main__':
+    unittest.main()
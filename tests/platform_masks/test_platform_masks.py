@@ -0,0 +1,58 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+from codebasin import config, finder
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestPlatformMasks(unittest.TestCase):
+    """
+    Test that platform associations stored as bitmasks are reported as
+    sets of platform names, including when there are too many platforms
+    for a 64-bit mask.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/include/"
+        logging.getLogger("codebasin").disabled = True
+
+    def test_numbering(self):
+        """platform_masks/numbering"""
+        state = finder.ParserState(True)
+        self.assertEqual(state.platform_bit("CPU"), 1)
+        self.assertEqual(state.platform_bit("GPU"), 2)
+        self.assertEqual(state.platform_bit("CPU"), 1)
+        self.assertEqual(state.platform_set(0), frozenset())
+        self.assertEqual(state.platform_set(3), frozenset(["CPU", "GPU"]))
+
+    def test_many_platforms(self):
+        """platform_masks/many_platforms"""
+        codebase, configuration = config.load("./tests/include/include.yaml", self.rootdir)
+
+        # Replicate each platform, so that there are more than 64
+        names = {"CPU": [], "GPU": []}
+        replicated = {}
+        for p in ["CPU", "GPU"]:
+            for i in range(40):
+                name = f"{p}{i}"
+                names[p].append(name)
+                replicated[name] = configuration[p]
+
+        state = finder.find(self.rootdir, codebase, replicated)
+        self.assertEqual(len(state.platforms), 80)
+        setmap = PlatformMapper(codebase).walk(state)
+
+        expected_setmap = {frozenset(names['CPU']): 11,
+                           frozenset(names['GPU']): 12,
+                           frozenset(names['CPU'] + names['GPU']): 16}
+        self.assertDictEqual(setmap, expected_setmap, "Mismatch in setmap")
+
+        node_associations = state.get_map(next(iter(state.get_filenames())))
+        for node in node_associations:
+            self.assertTrue(node_associations[node] <= frozenset(replicated.keys()))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,109 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+import os
+import shutil
+import tempfile
+from codebasin import cache, config, finder, util
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestPrefetch(unittest.TestCase):
+    """
+    Test that reading files ahead of the parser produces the same trees
+    as reading each file as it is parsed.
+    """
+
+    def setUp(self):
+        self.rootdir = tempfile.mkdtemp()
+        logging.getLogger("codebasin").disabled = True
+
+    def tearDown(self):
+        shutil.rmtree(self.rootdir)
+
+    def test_equivalence(self):
+        """prefetch/equivalence"""
+        rootdir = "./tests/streaming/"
+        codebase, configuration = config.load("./tests/streaming/streaming.yaml", rootdir)
+
+        state = finder.ParserState(True)
+        state.prefetch = 0
+        state.insert_files(codebase["files"])
+        for p in configuration:
+            for e in configuration[p]:
+                finder.associate(state, rootdir, p, e)
+        expected = PlatformMapper(codebase).walk(state)
+
+        state = finder.find(rootdir, codebase, configuration)
+        self.assertGreater(state.prefetch, 1)
+        setmap = PlatformMapper(codebase).walk(state)
+        self.assertDictEqual(setmap, expected, "Mismatch in setmap")
+
+    def test_read_ahead(self):
+        """prefetch/read_ahead"""
+        filenames = []
+        for i in range(10):
+            fn = os.path.join(self.rootdir, f"{i}.cpp")
+            with open(fn, "w") as f:
+                f.write(f"int x{i};\r\nint y{i};\n")
+            filenames.append(fn)
+        missing = os.path.join(self.rootdir, "missing.cpp")
+
+        results = list(finder._read_ahead(filenames + [missing], 4))
+        self.assertEqual([fn for (fn, _) in results], filenames + [missing])
+        self.assertIsNone(results[-1][1])
+        for (fn, data) in results[:-1]:
+            with open(fn, "rb") as f:
+                self.assertEqual(data, f.read())
+
+            # Hashes of prefetched files are not computed again
+            (_, digest) = util._file_hashes[fn]
+            self.assertEqual(util.compute_file_hash(fn), digest)
+
+        # Stopping early does not read every file
+        reader = finder._read_ahead(filenames, 2)
+        self.assertEqual(next(reader)[0], filenames[0])
+        reader.close()
+
+    def test_resident(self):
+        """prefetch/resident"""
+        filenames = []
+        for i in range(4):
+            fn = os.path.join(self.rootdir, f"{i}.cpp")
+            with open(fn, "w") as f:
+                f.write(f"int x{i};\n")
+            filenames.append(fn)
+
+        trees = cache.MemoryParseCache()
+        finder.ParserState(True, trees).insert_files(filenames)
+
+        with open(filenames[2], "a") as f:
+            f.write("int changed;\n")
+        st = os.stat(filenames[2])
+        os.utime(filenames[2], ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        # Only the changed file is read (and so hashed) again
+        util._file_hashes.clear()
+        state = finder.ParserState(True, trees)
+        state.insert_files(filenames)
+        self.assertEqual(list(util._file_hashes), [filenames[2]])
+        self.assertEqual(state.get_tree(filenames[2]).root.total_sloc, 2)
+
+    def test_parse_data(self):
+        """prefetch/parse_data"""
+        fn = os.path.join(self.rootdir, "source.cpp")
+        with open(fn, "wb") as f:
+            f.write(b"#ifdef A\r\nint a; // \xff\n#endif\nint b;\n")
+        with open(fn, "rb") as f:
+            data = f.read()
+
+        expected = finder._parse_file(fn, False)
+        tree = finder._parse_file(fn, False, data=data)
+        self.assertEqual([(str(node), node.num_lines) for node in tree.iter_nodes()],
+                         [(str(node), node.num_lines) for node in expected.iter_nodes()])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import itertools as it
+import json
+import logging
+import os
+import random
+import tempfile
+from codebasin import config, finder, report
+from codebasin.walkers.exporter import Exporter
+from codebasin.walkers.platform_mapper import PlatformMapper
+
+
+class TestDistanceMatrix(unittest.TestCase):
+    """
+    Test that the vectorized distance matrix and divergence agree with
+    the pair-wise definitions.
+    """
+
+    def test_random(self):
+        """report/random"""
+        rng = random.Random(0)
+        for _ in range(50):
+            platforms = [f"P{i}" for i in range(rng.randint(1, 8))]
+            setmap = {frozenset(): rng.randint(0, 10)}
+            for _ in range(rng.randint(1, 10)):
+                pset = frozenset(p for p in platforms if rng.random() < 0.5)
+                setmap[pset] = setmap.get(pset, 0) + rng.randint(1, 100)
+            platforms = report.extract_platforms(setmap)
+
+            matrix = report.distance_matrix(setmap, platforms)
+            for (i, p1) in enumerate(platforms):
+                for (j, p2) in enumerate(platforms):
+                    self.assertAlmostEqual(matrix[i, j], report.distance(setmap, p1, p2))
+            self.assertTrue((matrix == matrix.T).all())
+
+            pairs = list(it.combinations(platforms, 2))
+            expected = 0
+            if pairs:
+                expected = sum(report.distance(setmap, p1, p2) for (p1, p2) in pairs) / len(pairs)
+            self.assertAlmostEqual(report.divergence(setmap), expected)
+
+
+class TestAnnotatedDump(unittest.TestCase):
+    """
+    Test that the streaming annotated dump matches a dump of the whole
+    list of trees.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/include/"
+        logging.getLogger("codebasin").disabled = True
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def _dump(self, state, extension):
+        output_file = os.path.join(self.tmp.name, "dump" + extension)
+        report.annotated_dump(output_file, state)
+        with open(output_file, "r") as f:
+            return f.read()
+
+    def test_dump(self):
+        """report/annotated_dump"""
+        codebase, configuration = config.load("./tests/include/include.yaml", self.rootdir)
+        state = finder.find(self.rootdir, codebase, configuration)
+        outlist = [state.get_tree(fn).root.to_json(state.get_map(fn))
+                   for fn in state.get_filenames()]
+
+        self.assertEqual(self._dump(state, ".json"), json.dumps(outlist, indent=2))
+        lines = self._dump(state, ".jsonl").splitlines()
+        self.assertEqual([json.loads(line) for line in lines], outlist)
+
+    def test_empty(self):
+        """report/annotated_dump_empty"""
+        state = finder.ParserState(True)
+        self.assertEqual(self._dump(state, ".json"), json.dumps([], indent=2))
+        self.assertEqual(self._dump(state, ".jsonl"), "")
+
+
+class TestBinaryDump(unittest.TestCase):
+    """
+    Test that setmaps and coverage rebuilt from a binary dump match
+    those computed from the parser state.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/include/"
+        logging.getLogger("codebasin").disabled = True
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def assertDumpMatches(self, codebase, configuration):
+        state = finder.find(self.rootdir, codebase, configuration)
+        output_file = os.path.join(self.tmp.name, "dump.npz")
+        report.binary_dump(output_file, state, codebase)
+        dump = report.BinaryDump(output_file)
+
+        self.assertDictEqual(dump.setmap(), PlatformMapper(codebase).walk(state))
+
+        exports = Exporter(codebase).walk(state)
+        hashes = dict(zip(dump.file_hashes, dump.files))
+        for p in configuration:
+            expected = {hashes[h]: regions for (h, regions) in exports[p].items()}
+            self.assertEqual(dump.coverage(p), expected)
+
+    def test_dump(self):
+        """report/binary_dump"""
+        codebase, configuration = config.load("./tests/include/include.yaml", self.rootdir)
+        self.assertDumpMatches(codebase, configuration)
+
+        # Files outside of the codebase are not counted
+        codebase["files"] = [fn for fn in codebase["files"] if fn.endswith(".cpp")]
+        self.assertDumpMatches(codebase, configuration)
+
+    def test_many_platforms(self):
+        """report/binary_dump_many_platforms"""
+        codebase, configuration = config.load("./tests/include/include.yaml", self.rootdir)
+        replicated = {f"{p}{i}": configuration[p] for p in configuration for i in range(40)}
+        self.assertDumpMatches(codebase, replicated)
+
+    def test_empty(self):
+        """report/binary_dump_empty"""
+        output_file = os.path.join(self.tmp.name, "dump.npz")
+        report.binary_dump(output_file, finder.ParserState(True))
+        self.assertDictEqual(report.BinaryDump(output_file).setmap(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
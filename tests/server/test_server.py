@@ -0,0 +1,225 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+import io
+import json
+import os
+import shutil
+import tempfile
+from codebasin import server
+
+
+class EditingCache():
+    """
+    A parse cache that never hits, and appends a line to a file the
+    first time that it is asked for it after being armed, to simulate
+    an edit made while an analysis is running.
+    """
+
+    def __init__(self):
+        self.armed = None
+
+    def load(self, fn, summarize_only):
+        if fn == self.armed:
+            self.armed = None
+            with open(fn, "a") as f:
+                f.write("int during_analysis;\n")
+            st = os.stat(fn)
+            os.utime(fn, ns=(st.st_atime_ns, st.st_mtime_ns + 2 * 10**9))
+        return None
+
+    def store(self, fn, tree, summarize_only):
+        pass
+
+
+class TestServer(unittest.TestCase):
+    """
+    Test that the analysis server answers JSON-RPC queries, and keeps its
+    answers up to date as files change.
+    """
+
+    def setUp(self):
+        self.rootdir = tempfile.mkdtemp()
+        for fn in ["first.cpp", "second.cpp", "common.h", "unused.cpp"]:
+            shutil.copy(os.path.join("./tests/streaming", fn), self.rootdir)
+        self.config_file = os.path.join(self.rootdir, "server.yaml")
+        with open(self.config_file, "w") as f:
+            f.write("codebase:\n"
+                    "    files: [ '*.cpp', common.h ]\n"
+                    "    platforms: [ CPU, GPU ]\n"
+                    "CPU:\n"
+                    "    files: [ first.cpp ]\n"
+                    "    defines: [ CPU ]\n"
+                    "GPU:\n"
+                    "    files: [ first.cpp, second.cpp ]\n")
+        logging.getLogger("codebasin").disabled = True
+        self.server = server.AnalysisServer(self.config_file, self.rootdir, interval=0)
+        self.next_id = 0
+
+    def tearDown(self):
+        shutil.rmtree(self.rootdir)
+
+    def _call(self, method, **params):
+        self.next_id += 1
+        request = {"jsonrpc": "2.0", "id": self.next_id, "method": method, "params": params}
+        response = json.loads(self.server.handle(json.dumps(request)))
+        self.assertEqual(response["id"], self.next_id)
+        return response
+
+    def _summary(self):
+        setmap = self._call("summary")["result"]["setmap"]
+        return {frozenset(entry["platforms"]): entry["lines"] for entry in setmap}
+
+    def _modify(self, fn, text):
+        path = os.path.join(self.rootdir, fn)
+        with open(path, "a") as f:
+            f.write(text)
+        # Ensure the change is visible even with coarse timestamps
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+    def test_summary(self):
+        """server/summary"""
+        expected = {frozenset(["CPU", "GPU"]): 9,
+                    frozenset(["GPU"]): 3,
+                    frozenset([]): 1}
+        self.assertDictEqual(self._summary(), expected)
+
+    def test_platforms(self):
+        """server/platforms"""
+        result = self._call("platforms", file="first.cpp")["result"]
+        self.assertEqual(result["file"], os.path.join(os.path.realpath(self.rootdir),
+                                                      "first.cpp"))
+        self.assertEqual(result["platforms"], ["CPU", "GPU"])
+        self.assertEqual([r["start_line"] for r in result["regions"]], [1, 2, 3, 4, 5])
+
+        result = self._call("platforms", file="second.cpp", start_line=3)["result"]
+        self.assertEqual(result["regions"], [{"start_line": 3, "end_line": 3, "num_lines": 1,
+                                              "platforms": ["GPU"]}])
+
+        result = self._call("platforms", file="unused.cpp")["result"]
+        self.assertEqual(result["platforms"], [])
+
+    def test_errors(self):
+        """server/errors"""
+        response = json.loads(self.server.handle("{"))
+        self.assertEqual(response["error"]["code"], server.PARSE_ERROR)
+
+        response = json.loads(self.server.handle('{"id": 1, "method": "summary"}'))
+        self.assertEqual(response["error"]["code"], server.INVALID_REQUEST)
+
+        response = self._call("unknown")
+        self.assertEqual(response["error"]["code"], server.METHOD_NOT_FOUND)
+
+        for params in [{}, {"file": "missing.cpp"},
+                       {"file": "first.cpp", "start_line": "1"}]:
+            response = self._call("platforms", **params)
+            self.assertEqual(response["error"]["code"], server.INVALID_PARAMS)
+
+    def test_notifications(self):
+        """server/notifications"""
+        self.assertIsNone(self.server.handle('{"jsonrpc": "2.0", "method": "summary"}'))
+
+        batch = [{"jsonrpc": "2.0", "id": 1, "method": "summary"},
+                 {"jsonrpc": "2.0", "method": "summary"},
+                 {"jsonrpc": "2.0", "id": 2, "method": "unknown"}]
+        responses = json.loads(self.server.handle(json.dumps(batch)))
+        self.assertEqual([r["id"] for r in responses], [1, 2])
+        self.assertIn("result", responses[0])
+        self.assertIn("error", responses[1])
+
+    def test_changed_file(self):
+        """server/changed_file"""
+        self._modify("unused.cpp", "int more;\n")
+        self.assertEqual(self._summary()[frozenset([])], 2)
+
+        changed = self._call("refresh")["result"]["changed"]
+        self.assertEqual(changed, [])
+
+    def test_new_file(self):
+        """server/new_file"""
+        with open(os.path.join(self.rootdir, "extra.cpp"), "w") as f:
+            f.write("int extra;\nint extra2;\n")
+        changed = self._call("refresh")["result"]["changed"]
+        self.assertIn(os.path.realpath(self.rootdir), changed)
+        self.assertEqual(self._summary()[frozenset([])], 3)
+
+    def _refresh_replayed(self):
+        """
+        Check for changes, and return the log message describing how
+        many compilation commands were replayed.
+        """
+        logger = logging.getLogger("codebasin")
+        logger.disabled = False
+        try:
+            with self.assertLogs(logger, level="INFO") as logs:
+                self._call("refresh")
+        finally:
+            logger.disabled = True
+        return [line for line in logs.output if "Replayed" in line]
+
+    def test_unrelated_file(self):
+        """server/unrelated_file"""
+        history = self.server.history
+        with open(os.path.join(self.rootdir, ".first.cpp.swp"), "w") as f:
+            f.write("swap\n")
+        replayed = self._refresh_replayed()
+        self.assertIs(self.server.history, history)
+        self.assertEqual(len(replayed), 1)
+        self.assertIn("Replayed 3 compilation commands; re-analyzed 0", replayed[0])
+
+    def test_new_include(self):
+        """server/new_include"""
+        self._modify("second.cpp", '#include "extra.h"\n#ifdef EXTRA\nint extra;\n#endif\n')
+        result = self._call("platforms", file="second.cpp", start_line=6, end_line=6)
+        self.assertEqual(result["result"]["regions"][0]["platforms"], [])
+
+        with open(os.path.join(self.rootdir, "extra.h"), "w") as f:
+            f.write("#define EXTRA\n")
+        replayed = self._refresh_replayed()
+        self.assertIn("Replayed 2 compilation commands; re-analyzed 1", replayed[0])
+        result = self._call("platforms", file="second.cpp", start_line=6, end_line=6)
+        self.assertEqual(result["result"]["regions"][0]["platforms"], ["GPU"])
+
+    def test_changed_config(self):
+        """server/changed_config"""
+        with open(self.config_file, "r") as f:
+            text = f.read()
+        with open(self.config_file, "w") as f:
+            f.write(text.replace("files: [ first.cpp ]", "files: [ first.cpp, unused.cpp ]"))
+        st = os.stat(self.config_file)
+        os.utime(self.config_file, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+
+        result = self._call("platforms", file="unused.cpp")["result"]
+        self.assertEqual(result["platforms"], ["CPU"])
+
+    def test_edit_during_analysis(self):
+        """server/edit_during_analysis"""
+        parse_cache = EditingCache()
+        self.server = server.AnalysisServer(self.config_file, self.rootdir,
+                                            parse_cache=parse_cache, interval=0)
+        self._modify("unused.cpp", "int more;\n")
+        parse_cache.armed = os.path.join(os.path.realpath(self.rootdir), "unused.cpp")
+        self._summary()
+        self.assertIsNone(parse_cache.armed)
+
+        # The edit made during the analysis is found by the next query
+        self.assertEqual(self._summary()[frozenset([])], 3)
+
+    def test_stream(self):
+        """server/stream"""
+        instream = io.StringIO('{"jsonrpc": "2.0", "id": 1, "method": "summary"}\n'
+                               "\n"
+                               '{"jsonrpc": "2.0", "id": 2, "method": "shutdown"}\n'
+                               '{"jsonrpc": "2.0", "id": 3, "method": "summary"}\n')
+        outstream = io.StringIO()
+        server.serve_stream(self.server, instream, outstream)
+        responses = [json.loads(line) for line in outstream.getvalue().splitlines()]
+        self.assertEqual([r["id"] for r in responses], [1, 2])
+        self.assertTrue(self.server.stopped)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,72 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import os
+import subprocess
+import sys
+
+
+def import_times(statement):
+    """
+    Run statement in a fresh interpreter with -X importtime, and return a
+    dict mapping each imported module to its cumulative import time in
+    microseconds.
+    """
+    rootdir = os.path.realpath(os.path.join(os.path.dirname(__file__), "..", ".."))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join([rootdir] + [p for p in [env.get("PYTHONPATH")] if p])
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", statement],
+                            cwd=rootdir, env=env, capture_output=True, text=True, check=True)
+    times = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        (_, cumulative, name) = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative)
+    return times
+
+
+class TestStartup(unittest.TestCase):
+    """
+    Test that importing the modules used by the command-line tools does
+    not load heavy dependencies, which are only needed by some commands.
+    """
+
+    heavy = ["numpy", "yaml", "jsonschema", "matplotlib", "scipy", "concurrent.futures"]
+
+    def check(self, modules):
+        statement = "; ".join(f"import {module}" for module in modules)
+        times = import_times(statement)
+        for module in modules:
+            self.assertIn(module, times, "import of %s was not measured" % module)
+        loaded = [module for module in self.heavy if module in times]
+        self.assertEqual(loaded, [], "%s loaded at startup (%d us total)" % (
+            ", ".join(loaded), sum(times[m] for m in modules)))
+
+    def test_codebasin(self):
+        """Check the modules imported by codebasin.py"""
+        self.check(["codebasin.cache", "codebasin.config", "codebasin.finder",
+                    "codebasin.incremental", "codebasin.report", "codebasin.util",
+                    "codebasin.walkers.platform_mapper"])
+
+    def test_etc(self):
+        """Check the modules imported by the etc/ scripts"""
+        self.check(["codebasin.walkers.exporter", "codebasin.walkers.source_printer",
+                    "codebasin.preprocessor", "codebasin.platform", "codebasin.file_source"])
+
+    def test_platform_mapper(self):
+        """Check that building a setmap does not load numpy"""
+        statement = "; ".join([
+            "from codebasin import config, finder",
+            "from codebasin.walkers.platform_mapper import PlatformMapper",
+            "(codebase, configuration) = config.load("
+            "'tests/nesting/nesting.yaml', 'tests/nesting/')",
+            "state = finder.find('tests/nesting/', codebase, configuration)",
+            "assert PlatformMapper(codebase).walk(state)",
+        ])
+        self.assertNotIn("numpy", import_times(statement))
+
+
+if __name__ == '__main__':
+    unittest.main()
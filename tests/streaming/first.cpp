@@ -0,0 +1,5 @@
+#include "common.h"
+#ifdef CPU
+int cpu;
+#endif
+int first;
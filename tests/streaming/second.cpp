@@ -0,0 +1,3 @@
+#define CPU
+#include "first.cpp"
+int second;
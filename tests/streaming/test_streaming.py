@@ -0,0 +1,41 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import logging
+from codebasin import config, finder
+from codebasin.walkers.platform_mapper import PlatformMapper
+from tests.configs import load_configs
+
+
+class TestStreaming(unittest.TestCase):
+    """
+    Test that the streaming pipeline produces the same setmap as
+    finding all codepaths and then mapping them.
+    """
+
+    def setUp(self):
+        self.rootdir = "./tests/streaming/"
+        logging.getLogger("codebasin").disabled = True
+
+        self.expected_setmap = {frozenset(['CPU', 'GPU']): 9,
+                                frozenset(['GPU']): 3,
+                                frozenset([]): 1}
+
+    def test_yaml(self):
+        """streaming/streaming.yaml"""
+        codebase, configuration = config.load("./tests/streaming/streaming.yaml", self.rootdir)
+        setmap = finder.stream(self.rootdir, codebase, configuration)
+        self.assertDictEqual(setmap, self.expected_setmap, "Mismatch in setmap")
+
+    def test_equivalence(self):
+        """streaming/equivalence"""
+        for (config_file, rootdir, codebase, configuration) in load_configs(self):
+            state = finder.find(rootdir, codebase, configuration)
+            expected = PlatformMapper(codebase).walk(state)
+            setmap = finder.stream(rootdir, codebase, configuration)
+            self.assertDictEqual(setmap, expected, config_file)
+
+
+if __name__ == '__main__':
+    unittest.main()
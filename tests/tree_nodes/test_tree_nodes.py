@@ -0,0 +1,46 @@
+# Copyright (C) 2019-2023 Intel Corporation
+# SPDX-License-Identifier: BSD-3-Clause
+
+import unittest
+import glob
+from codebasin import file_parser
+
+
+class TestTreeNodes(unittest.TestCase):
+    """
+    Test that SourceTree.iter_nodes visits every node in pre-order.
+    """
+
+    def assertPreOrder(self, tree):
+        nodes = list(tree.iter_nodes())
+        index = {id(node): i for (i, node) in enumerate(nodes)}
+
+        self.assertIs(nodes[0], tree.root)
+        self.assertEqual(len(index), len(nodes))
+        self.assertEqual(nodes, tree.nodes())
+        for (i, node) in enumerate(nodes):
+            if node.parent is None:
+                self.assertEqual(i, 0)
+            else:
+                self.assertLess(index[id(node.parent)], i)
+            positions = [index[id(child)] for child in node.children]
+            self.assertEqual(positions, sorted(positions))
+            if positions:
+                self.assertEqual(positions[0], i + 1)
+
+    def test_sources(self):
+        """tree_nodes/sources"""
+        for fn in sorted(glob.glob("./tests/**/*.[ch]", recursive=True) +
+                         glob.glob("./tests/**/*.[ch]pp", recursive=True)):
+            tree = file_parser.FileParser(fn).parse_file()
+            self.assertPreOrder(tree)
+
+    def test_slots(self):
+        """tree_nodes/slots"""
+        tree = file_parser.FileParser("./tests/nesting/main.cpp").parse_file()
+        for node in tree.iter_nodes():
+            self.assertFalse(hasattr(node, "__dict__"), repr(node))
+
+
+if __name__ == '__main__':
+    unittest.main()